@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+预处理缩放基准测试：对比不同长边上限（max_side）下的 OCR 吞吐量与匹配准确率
+
+用法（在项目根目录执行）：
+    python benchmarks/bench_downscale.py --a A组目录 --b B组目录 --limits 0,4000,3000,2000,1600
+
+- 每个上限都会重新启动引擎池、不使用持久化缓存，完整识别 A、B 两组图片；
+- 0 表示不缩放，作为基准：其余上限的匹配结果与基准逐张比对，给出一致率；
+- 如果 B 组文件已经按 A 组命名（同名即正确答案），加上 --labeled 额外输出真实准确率。
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_core import (  # noqa: E402
+    ImageConversionStage,
+    OCREnginePool,
+    OCRPage,
+    TextFingerprint,
+    fingerprint_similarity,
+    resource_path,
+    scan_image_folder,
+)
+
+
+def best_matches(a_texts: Dict[str, str], b_texts: Dict[str, str], threshold: float) -> Dict[str, Optional[str]]:
+    """每张 B 图在 A 组中相似度最高（且不低于阈值）的图片"""
+    a_prints = {a_path: TextFingerprint.from_text(a_text) for a_path, a_text in a_texts.items()}
+    result = {}
+    for b_path, b_text in b_texts.items():
+        best_path, best_score = None, 0.0
+        b_print = TextFingerprint.from_text(b_text)
+        if b_print:
+            for a_path, a_print in a_prints.items():
+                if not a_print:
+                    continue
+                score = fingerprint_similarity(a_print, b_print)
+                if score >= threshold and score > best_score:
+                    best_path, best_score = a_path, score
+        result[b_path] = best_path
+    return result
+
+
+def run_ocr(exe_path: str, paths: List[str], max_side: int, workers: Optional[int]) -> Dict[str, str]:
+    pool = OCREnginePool(exe_path, size=workers, converter=ImageConversionStage(max_side=max_side or None))
+    pool.start()
+    try:
+        futures = {path: pool.submit(path) for path in paths}
+        texts = {}
+        for path, future in futures.items():
+            try:
+                # 与界面一致：按置信度与长度预算过滤后的文本参与匹配
+                texts[path] = OCRPage.from_lines(future.result()).match_text()
+            except Exception as e:
+                print(f"[基准] 识别失败 {os.path.basename(path)}: {e}")
+                texts[path] = ""
+        return texts
+    finally:
+        pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 预处理缩放基准测试")
+    parser.add_argument("--a", required=True, help="A 组（标准参考）图片目录")
+    parser.add_argument("--b", required=True, help="B 组（待匹配）图片目录")
+    parser.add_argument("--limits", default="0,4000,3000,2000,1600", help="逗号分隔的长边上限，0 表示不缩放")
+    parser.add_argument("--threshold", type=float, default=0.80, help="匹配阈值（0~1）")
+    parser.add_argument("--workers", type=int, default=None, help="引擎进程数，默认按 CPU 核心数计算")
+    parser.add_argument("--labeled", action="store_true", help="B 组文件名与对应 A 组文件名相同，可计算真实准确率")
+    parser.add_argument(
+        "--engine",
+        default=resource_path(os.path.join("PaddleOCR-json_v1.4.1", "PaddleOCR-json.exe")),
+        help="PaddleOCR-json.exe 路径",
+    )
+    args = parser.parse_args()
+
+    a_paths = scan_image_folder(args.a)
+    b_paths = scan_image_folder(args.b)
+    limits = [int(x) for x in args.limits.split(",") if x.strip()]
+    if 0 not in limits:
+        limits.insert(0, 0)
+    limits.sort(key=lambda x: (x != 0, -x))
+    total = len(a_paths) + len(b_paths)
+    print(f"A 组 {len(a_paths)} 张，B 组 {len(b_paths)} 张，阈值 {args.threshold:.2f}")
+
+    baseline: Optional[Dict[str, Optional[str]]] = None
+    rows = []
+    for limit in limits:
+        start = time.perf_counter()
+        texts = run_ocr(args.engine, a_paths + b_paths, limit, args.workers)
+        elapsed = time.perf_counter() - start
+        matches = best_matches(
+            {p: texts[p] for p in a_paths}, {p: texts[p] for p in b_paths}, args.threshold
+        )
+        if baseline is None:
+            baseline = matches
+        agree = sum(1 for b in b_paths if matches[b] == baseline[b]) / max(1, len(b_paths))
+        matched = sum(1 for b in b_paths if matches[b])
+        accuracy = None
+        if args.labeled:
+            correct = sum(
+                1 for b in b_paths
+                if matches[b] and Path(matches[b]).stem == Path(b).stem
+            )
+            accuracy = correct / max(1, len(b_paths))
+        rows.append((limit, total / elapsed if elapsed else 0.0, elapsed, matched, agree, accuracy))
+
+    print()
+    header = f"{'长边上限':>8} {'张/秒':>8} {'耗时(s)':>9} {'已匹配':>6} {'与基准一致':>10}"
+    if args.labeled:
+        header += f" {'准确率':>8}"
+    print(header)
+    for limit, rate, elapsed, matched, agree, accuracy in rows:
+        line = f"{(limit or '原图'):>8} {rate:8.2f} {elapsed:9.1f} {matched:6d} {agree:10.1%}"
+        if accuracy is not None:
+            line += f" {accuracy:8.1%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+匹配基准测试：用合成的 OCR 文本对比 n-gram 候选索引与逐一比较的耗时和召回率
+
+用法（在项目根目录执行）：
+    python benchmarks/bench_match.py --n 10000 --length 300 --noise 0.05 --top-k 20
+    python benchmarks/bench_match.py --n 100000 --mode lsh --bands 32 --num-perm 128 --sample 0
+
+- 按齐普夫分布从常用汉字中生成 A 组文本，B 组为 A 组文本随机替换部分字符后的副本（打乱顺序）；
+- 候选召回率（Recall@K）：正确答案出现在 MatchIndex 前 K 个候选中的比例；
+  lsh 模式额外给出理论上的候选概率，用于调整 --bands / --num-perm；
+- 逐一比较很慢，只在 --sample 张 B 组图片上执行，用于核对两种方式的匹配结果是否一致；
+- --length-spread 让文本长度在 length·(1±spread) 之间变化，用于观察长度上界剪枝跳过的比较比例。
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_core import (  # noqa: E402
+    NUMPY_AVAILABLE,
+    MatchIndex,
+    assign_matches,
+    iter_matches,
+    lsh_candidate_probability,
+    text_ngrams,
+)
+
+
+def make_corpus(
+    n: int, length: int, noise: float, seed: int, spread: float = 0.0,
+) -> Tuple[Dict[str, str], List[Tuple[str, str, str]]]:
+    """返回 (A组路径 -> 文本, [(B组路径, 文本, 正确的A组路径), ...])"""
+    rng = random.Random(seed)
+    chars = [chr(0x4E00 + i) for i in range(3000)]
+    weights = [1.0 / (i + 1) for i in range(len(chars))]
+    header = "第一章 数学练习 "
+    a_texts = {}
+    for i in range(n):
+        k = max(1, int(length * rng.uniform(1 - spread, 1 + spread)))
+        a_texts[f"a{i:06d}.png"] = header + "".join(rng.choices(chars, weights, k=k))
+
+    b_items = []
+    for i, a_path in enumerate(rng.sample(list(a_texts), n)):
+        text = list(a_texts[a_path])
+        for _ in range(int(len(text) * noise)):
+            text[rng.randrange(len(text))] = rng.choice(chars)
+        b_items.append((f"b{i:06d}.png", "".join(text), a_path))
+    return a_texts, b_items
+
+
+def pruning_rate(index: MatchIndex, pruned: int, scored: int) -> float:
+    """自 (pruned, scored) 计数以来，因长度上界被跳过的比较占全部候选比较的比例"""
+    pruned = index.length_pruned - pruned
+    scored = index.score_hits + index.score_misses - scored
+    return pruned / max(pruned + scored, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="匹配候选索引基准测试")
+    parser.add_argument("--n", type=int, default=10000, help="A、B 组各自的图片数")
+    parser.add_argument("--length", type=int, default=300, help="每张图片的文本长度（字符）")
+    parser.add_argument("--length-spread", type=float, default=0.0, help="文本长度的相对变化范围（0 表示等长）")
+    parser.add_argument("--noise", type=float, default=0.05, help="B 组文本中被随机替换的字符比例")
+    parser.add_argument("--threshold", type=float, default=0.80, help="匹配阈值（0~1）")
+    parser.add_argument("--top-k", type=int, default=20, help="每张 B 组图片精确比较的候选数")
+    parser.add_argument("--mode", choices=("ngram", "lsh"), default="ngram", help="候选索引模式")
+    parser.add_argument("--num-perm", type=int, default=128, help="lsh 模式的 MinHash 签名长度")
+    parser.add_argument("--bands", type=int, default=32, help="lsh 模式的分段数（需整除签名长度）")
+    parser.add_argument("--assignment", choices=("optimal", "global_greedy", "sequential"), default="optimal",
+                        help="一对一分配方式")
+    parser.add_argument("--sample", type=int, default=20, help="与逐一比较核对结果的 B 组图片数（0 表示跳过）")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    a_texts, b_items = make_corpus(args.n, args.length, args.noise, args.seed, args.length_spread)
+    print(f"[基准] A 组 {len(a_texts)} 张，B 组 {len(b_items)} 张，文本 {args.length} 字，噪声 {args.noise:.0%}")
+
+    def build_index(top_k: int) -> MatchIndex:
+        index = MatchIndex(args.threshold, size_limit=False, top_k=top_k,
+                           mode=args.mode, num_perm=args.num_perm, bands=args.bands)
+        for a_path, text in a_texts.items():
+            index.add(a_path, text)
+        return index
+
+    started = time.perf_counter()
+    index = build_index(args.top_k)
+    keys = sum(len(index._grams[a_path]) for a_path in a_texts) / max(len(a_texts), 1)
+    print(f"[基准] 建立{args.mode}索引: {time.perf_counter() - started:.2f}s，每张图片登记 {keys:.0f} 个索引键"
+          + ("" if args.mode == "ngram" or NUMPY_AVAILABLE else "（未安装 numpy，签名用纯 Python 计算）"))
+    if args.mode == "lsh":
+        b_path, text, answer = b_items[0]
+        a_grams, b_grams = text_ngrams(a_texts[answer]), text_ngrams(text)
+        jaccard = len(a_grams & b_grams) / len(a_grams | b_grams)
+        print(f"[基准] 正确配对的 n-gram Jaccard 约 {jaccard:.2f}，理论候选概率 "
+              + "，".join(f"J={j}: {lsh_candidate_probability(j, args.bands, args.num_perm):.1%}"
+                         for j in (0.3, 0.5, round(jaccard, 2))))
+
+    started = time.perf_counter()
+    hits = sum(1 for _b_path, text, answer in b_items if answer in set(index.candidates(text)))
+    elapsed = time.perf_counter() - started
+    print(f"[基准] 候选生成: {elapsed:.2f}s（{elapsed / len(b_items) * 1000:.2f} ms/张），"
+          f"Recall@{args.top_k} {hits / len(b_items):.2%}")
+
+    started = time.perf_counter()
+    b_stream = ((b_path, text, (0, 0)) for b_path, text, _answer in b_items)
+    pruned, scored = index.length_pruned, index.score_hits + index.score_misses
+    matches = assign_matches(index, b_stream, args.assignment)
+    elapsed = time.perf_counter() - started
+    answers = {b_path: answer for b_path, _text, answer in b_items}
+    correct = sum(1 for b_path, a_path, _similarity in matches if answers[b_path] == a_path)
+    print(f"[基准] 索引匹配（{args.assignment}）: {elapsed:.2f}s，匹配 {len(matches)} 张，正确 {correct} 张，"
+          f"长度剪枝 {pruning_rate(index, pruned, scored):.1%}")
+
+    sample = b_items[:args.sample]
+    if not sample:
+        return
+    results = []
+    for name, top_k in (("索引", args.top_k), ("逐一比较", 0)):
+        index = build_index(top_k)
+        started = time.perf_counter()
+        results.append({b: a for b, a, _s in iter_matches(index, ((b, text, (0, 0)) for b, text, _answer in sample))})
+        print(f"[基准] 抽样 {len(sample)} 张 {name}: {time.perf_counter() - started:.2f}s，"
+              f"长度剪枝 {pruning_rate(index, 0, 0):.1%}")
+    agree = sum(1 for b_path, _text, _answer in sample if results[0].get(b_path) == results[1].get(b_path))
+    print(f"[基准] 抽样结果一致率: {agree / max(len(sample), 1):.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+无界面批处理：识别 A/B 两组图片，匹配后把 B 组图片重命名为对应的 A 组图片名称
+
+用法：
+    python main.py batch --a A组目录 --b B组目录 [--threshold 0.8] [--workers N] [--dry-run]
+
+- 不导入 PySide6，可在无图形环境的服务器或计划任务中运行；
+- 进度以 JSON Lines 写到 stdout（每行一个事件，字段 event 区分类型），其余日志写到 stderr；
+- 退出码：0 全部成功；1 有图片识别或重命名失败；2 参数错误；3 OCR 引擎不可用；130 被中断。
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from ocr_core import (
+    OCR_MAX_SIDE,
+    OCREnginePool,
+    OCRPage,
+    OCRResultCache,
+    ROITemplate,
+    apply_renames,
+    engine_config_key,
+    MATCH_ASSIGNMENT,
+    SIZE_TOLERANCE,
+    MatchIndex,
+    assign_global_greedy,
+    assign_optimal,
+    candidate_edges,
+    choose_index_mode,
+    direct_match,
+    extract_match_key,
+    find_paddleocr_exe,
+    iter_matches,
+    iter_ocr,
+    parse_key_rules,
+    plan_renames,
+    scan_image_folder,
+)
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_ENGINE = 3
+EXIT_INTERRUPTED = 130
+
+
+class JsonLinesReporter:
+    """把进度事件逐行写成 JSON（写完立即 flush，便于调度程序实时读取）"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def emit(self, event: str, **fields):
+        fields = {"event": event, **fields}
+        self.stream.write(json.dumps(fields) + "\n")
+        self.stream.flush()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="无界面批处理：识别 A/B 两组图片并把 B 组图片重命名为匹配的 A 组名称",
+    )
+    parser.add_argument("--a", required=True, help="A 组（模板）图片目录")
+    parser.add_argument("--b", required=True, help="B 组（待重命名）图片目录")
+    parser.add_argument("--threshold", type=float, default=0.80, help="相似度阈值（0~1，默认 0.8）")
+    parser.add_argument("--workers", type=int, default=None, help="OCR 引擎进程数（默认 CPU 核心数 / 单引擎线程数）")
+    parser.add_argument("--dry-run", action="store_true", help="只输出匹配与重命名计划，不修改文件")
+    parser.add_argument("--ignore-size", action="store_true", help="忽略尺寸限制（默认只匹配尺寸相同的图片）")
+    parser.add_argument(
+        "--size-tolerance", type=float, default=SIZE_TOLERANCE,
+        help="尺寸限制的容差：宽、高相对差不超过该比例视为尺寸相同（默认 0，必须完全相同）",
+    )
+    parser.add_argument(
+        "--key-rule", action="append", default=[],
+        help="匹配键提取规则（可重复，按顺序尝试），例如 regex:第(\\d+)页、line:0、rect:0,0.9,1,1；"
+             "匹配键相同的图片直接配对，没有相同的键时才比较整页文本",
+    )
+    parser.add_argument("--roi", default="full", help="识别区域模板，例如 full、top:20、rect:0,0,1,0.3")
+    parser.add_argument("--no-cache", action="store_true", help="不使用持久化 OCR 结果缓存")
+    parser.add_argument("--engine", default=None, help="PaddleOCR-json.exe 路径（默认自动查找）")
+    parser.add_argument(
+        "--index", choices=("auto", "ngram", "lsh"), default="auto",
+        help="匹配候选索引：ngram 倒排索引，lsh 为 MinHash/LSH（超大 A 组内存更小），auto 按 A 组规模选择",
+    )
+    parser.add_argument(
+        "--assignment", choices=("optimal", "global_greedy", "sequential"), default=MATCH_ASSIGNMENT,
+        help="一对一分配方式：optimal 总相似度最大，global_greedy 按相似度从高到低，sequential 按识别完成顺序",
+    )
+    return parser
+
+
+def read_image_size(img_path: str) -> Tuple[int, int]:
+    """只读取图片头获取尺寸，失败时返回 (0, 0)（视为尺寸未知，不参与尺寸限制）"""
+    try:
+        with Image.open(img_path) as img:
+            return img.size
+    except Exception:
+        return 0, 0
+
+
+def ocr_group(
+    pool: OCREnginePool,
+    group: str,
+    paths: List[str],
+    reporter: JsonLinesReporter,
+    result_cache: Optional[OCRResultCache],
+    roi: Optional[ROITemplate],
+    on_text: Optional[Callable[[str, str, OCRPage], None]] = None,
+) -> Tuple[Dict[str, str], int]:
+    """
+    识别一组图片，返回 (图片路径 -> 匹配文本, 失败张数)；缓存命中的图片不经过引擎。
+    on_text(图片路径, 匹配文本, 识别结果) 在每张图片识别成功后立即调用。
+    """
+    texts: Dict[str, str] = {}
+    failed = 0
+    total = len(paths)
+    for done, result in enumerate(iter_ocr(pool, paths, result_cache, roi), 1):
+        texts[result.path] = result.page.match_text()
+        if not result.ok:
+            failed += 1
+            reporter.emit("ocr", group=group, path=result.path, status="failed",
+                          error=str(result.error), done=done, total=total)
+            continue
+        reporter.emit("ocr", group=group, path=result.path, status="cached" if result.cached else "ok",
+                      chars=len(texts[result.path]), done=done, total=total)
+        if on_text is not None:
+            on_text(result.path, texts[result.path], result.page)
+    return texts, failed
+
+
+def run_batch(args: argparse.Namespace, reporter: JsonLinesReporter) -> int:
+    """执行一次批处理，返回退出码"""
+    started = time.monotonic()
+    for group, folder in (("A", args.a), ("B", args.b)):
+        if not os.path.isdir(folder):
+            reporter.emit("error", stage="args", message=f"{group} 组目录不存在: {folder}")
+            return EXIT_USAGE
+    if not 0.0 <= args.threshold <= 1.0:
+        reporter.emit("error", stage="args", message=f"相似度阈值必须在 0~1 之间: {args.threshold}")
+        return EXIT_USAGE
+    if not 0.0 <= args.size_tolerance < 1.0:
+        reporter.emit("error", stage="args", message=f"尺寸容差必须在 0~1 之间: {args.size_tolerance}")
+        return EXIT_USAGE
+    if args.workers is not None and args.workers < 1:
+        reporter.emit("error", stage="args", message=f"引擎进程数必须至少为 1: {args.workers}")
+        return EXIT_USAGE
+    try:
+        roi = ROITemplate.parse(args.roi)
+        key_rules = parse_key_rules(args.key_rule)
+    except ValueError as e:
+        reporter.emit("error", stage="args", message=str(e))
+        return EXIT_USAGE
+
+    exe_path = os.path.abspath(args.engine) if args.engine else find_paddleocr_exe()
+    if not exe_path or not os.path.exists(exe_path):
+        reporter.emit("error", stage="engine", message="未找到 PaddleOCR-json.exe")
+        return EXIT_ENGINE
+
+    a_paths = scan_image_folder(args.a)
+    b_paths = scan_image_folder(args.b)
+    reporter.emit("start", a=len(a_paths), b=len(b_paths), threshold=args.threshold,
+                  dry_run=args.dry_run, engine=exe_path)
+
+    result_cache = None
+    if not args.no_cache:
+        try:
+            result_cache = OCRResultCache(engine_config_key(exe_path, max_side=OCR_MAX_SIDE))
+        except Exception as e:
+            # 缓存不可用不影响识别，只是每次都要重新 OCR
+            print(f"[批处理] OCR结果缓存不可用: {e}")
+
+    pool = OCREnginePool(exe_path, size=args.workers)
+    try:
+        try:
+            pool.start()
+        except Exception as e:
+            reporter.emit("error", stage="engine", message=str(e))
+            return EXIT_ENGINE
+
+        # 匹配键在识别结果到达时提取（rect 规则需要图片尺寸）
+        a_keys: Dict[str, Optional[str]] = {}
+        sizes: Dict[str, Tuple[int, int]] = {}
+
+        def image_size(img_path: str) -> Tuple[int, int]:
+            if img_path not in sizes:
+                sizes[img_path] = read_image_size(img_path)
+            return sizes[img_path]
+
+        def keep_a_key(a_path: str, _a_text: str, a_page: OCRPage):
+            if key_rules:
+                a_keys[a_path] = extract_match_key(a_page, key_rules, image_size(a_path))
+
+        a_texts, a_failed = ocr_group(pool, "A", a_paths, reporter, result_cache, roi, on_text=keep_a_key)
+
+        # B 组边识别边匹配：每识别完一张先按匹配键、规范化文本的摘要查找 A 组图片（找到即直接配对），
+        # 否则在 A 组索引中计算候选相似度；sequential 直接占用最佳匹配，其余分配方式在识别结束后统一求解
+        mode = choose_index_mode(len(a_paths)) if args.index == "auto" else args.index
+        a_index = MatchIndex(args.threshold, size_limit=not args.ignore_size, mode=mode,
+                             size_tolerance=args.size_tolerance)
+        for a_path in a_paths:
+            a_size = (0, 0) if args.ignore_size else image_size(a_path)
+            a_index.add(a_path, a_texts.get(a_path, ""), a_size, a_keys.get(a_path))
+        matches: List[Tuple[str, str, float]] = []
+        edges: List[Tuple[str, str, float]] = []
+
+        def match_b(b_path: str, b_text: str, b_page: OCRPage):
+            b_key = extract_match_key(b_page, key_rules, image_size(b_path)) if key_rules else None
+            b_size = (0, 0) if args.ignore_size else image_size(b_path)
+            b_stream = [(b_path, b_text, b_size, b_key)]
+            if args.assignment != "sequential":
+                match = direct_match(a_index, b_stream[0])
+                if match is None:
+                    edges.extend(candidate_edges(a_index, b_stream))
+                    return
+                matches.append(match)
+                reporter.emit("match", b=b_path, a=match[1], similarity=round(match[2], 4))
+                return
+            for match in iter_matches(a_index, b_stream):
+                matches.append(match)
+                reporter.emit("match", b=match[0], a=match[1], similarity=round(match[2], 4))
+
+        _b_texts, b_failed = ocr_group(pool, "B", b_paths, reporter, result_cache, roi, on_text=match_b)
+    finally:
+        pool.stop()
+        if result_cache is not None:
+            result_cache.close()
+
+    if args.assignment != "sequential":
+        # 收集候选之后才被精确配对占用的 A 组图片不再参与分配
+        edges = [edge for edge in edges if edge[1] not in a_index.claimed]
+        fuzzy = assign_optimal(edges) if args.assignment == "optimal" else assign_global_greedy(edges)
+        for b_path, a_path, similarity in fuzzy:
+            reporter.emit("match", b=b_path, a=a_path, similarity=round(similarity, 4))
+        matches.extend(fuzzy)
+
+    renamed = 0
+    rename_failed = 0
+    plan = plan_renames(matches)
+    if args.dry_run:
+        for source, target in plan:
+            reporter.emit("rename", source=source, target=target, dry_run=True)
+        renamed = len(plan)
+    else:
+        for source, target, error in apply_renames(plan):
+            if error is not None:
+                rename_failed += 1
+                reporter.emit("error", stage="rename", path=source, target=target, message=str(error))
+                continue
+            renamed += 1
+            reporter.emit("rename", source=source, target=target, dry_run=False)
+
+    reporter.emit(
+        "summary",
+        a=len(a_paths), b=len(b_paths),
+        ocr_failed=a_failed + b_failed,
+        matched=len(matches), keyed=a_index.key_hits, exact=a_index.exact_hits, unmatched=len(b_paths) - len(matches),
+        compared=a_index.score_misses + a_index.score_hits, length_pruned=a_index.length_pruned,
+        renamed=renamed, rename_failed=rename_failed,
+        dry_run=args.dry_run,
+        seconds=round(time.monotonic() - started, 2),
+    )
+    if a_failed or b_failed or rename_failed:
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        # argparse 在参数错误时退出码为 2，--help 时为 0
+        return e.code if isinstance(e.code, int) else EXIT_USAGE
+
+    # stdout 只留给 JSON 事件：核心库的 print 日志临时改写到 stderr
+    reporter = JsonLinesReporter(sys.stdout)
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        return run_batch(args, reporter)
+    except KeyboardInterrupt:
+        reporter.emit("error", stage="interrupted", message="批处理被中断")
+        return EXIT_INTERRUPTED
+    finally:
+        sys.stdout = stdout
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
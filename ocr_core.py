@@ -0,0 +1,2734 @@
+# -*- coding: utf-8 -*-
+"""
+Umi-OCR 智能重命名助手 - 核心库（不依赖 PySide6）
+
+OCR 引擎控制与引擎池、图片预处理、识别结果缓存、文本相似度匹配与重命名辅助函数。
+图形界面（ocr_gui.py）与无界面批处理（ocr_batch.py）共用这些实现。
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import queue
+import base64
+import struct
+import sqlite3
+import math
+import bisect
+import hashlib
+import difflib
+import importlib.util
+import heapq
+import random
+import threading
+import unicodedata
+import zlib
+import subprocess
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
+from PIL import Image
+from io import BytesIO
+
+
+def get_base_dir() -> str:
+    """
+    获取程序运行的基础目录，兼容开发环境与 PyInstaller 打包后的 onefile 模式。
+    
+    - 开发环境：返回当前脚本所在目录
+    - 打包后：返回可执行文件 exe 所在目录（用于查找旁边的 PaddleOCR-json_v1.4.1 文件夹）
+    """
+    # PyInstaller 冻结后的程序会设置 sys.frozen = True
+    if getattr(sys, "frozen", False):
+        # sys.executable 即打包后的 exe 路径
+        return os.path.dirname(os.path.abspath(sys.executable))
+    # 正常的 Python 运行环境
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def resource_path(relative_path: str) -> str:
+    """
+    将相对路径转换为基于程序根目录的绝对路径。
+    
+    这里统一从「脚本 / exe 所在目录」开始，并返回绝对路径，
+    方便采用「1 个 EXE + 1 个 OCR 文件夹」的半独立打包方案，
+    同时避免多线程 / 子进程切换工作目录导致的相对路径问题。
+    """
+    return os.path.abspath(os.path.join(get_base_dir(), relative_path))
+
+
+def get_cache_dir() -> str:
+    """
+    获取用户缓存目录（用于持久化 OCR 结果缓存）。
+    
+    - Windows：%LOCALAPPDATA%\\UmiOCR-Rename\\cache
+    - 其他平台：$XDG_CACHE_HOME/UmiOCR-Rename 或 ~/.cache/UmiOCR-Rename
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "UmiOCR-Rename", "cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "UmiOCR-Rename")
+
+# 模糊匹配
+try:
+    from fuzzywuzzy import fuzz
+    FUZZYWUZZY_AVAILABLE = True
+except ImportError:
+    FUZZYWUZZY_AVAILABLE = False
+    print("警告：未安装 fuzzywuzzy，将使用 difflib 作为备选", file=sys.stderr)
+
+# MinHash 签名向量化计算（可选；未安装时使用纯 Python 实现，结果相同但较慢）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# 全局最优匹配的求解器（可选；未安装时使用纯 Python 的匈牙利算法）。
+# 导入 scipy 需要零点几秒，这里只检查是否安装，第一次求解时再导入
+SCIPY_AVAILABLE = importlib.util.find_spec("scipy") is not None
+
+# HEIC / HEIF 解码插件（可选；Pillow 本身不能解码，未安装时不收集这两种格式）。
+# 在模块导入时注册，进程池子进程导入本模块时同样生效
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIF_AVAILABLE = True
+except ImportError:
+    HEIF_AVAILABLE = False
+
+# 繁简折叠（可选；仅在 TEXT_FOLD_VARIANTS 开启时使用）
+try:
+    import opencc
+    OPENCC_AVAILABLE = True
+except ImportError:
+    opencc = None
+    OPENCC_AVAILABLE = False
+
+
+# 每个引擎进程使用的推理线程数（对应 PaddleOCR-json 的 cpu_threads 参数）
+ENGINE_CPU_THREADS = 4
+# 流水线深度：每个引擎 stdin 中最多同时排队的请求数（1 即传统的一问一答模式）
+PIPELINE_DEPTH = 3
+# 计算图片内容哈希的线程数（网络共享盘上主要耗在 I/O，多线程可以重叠等待）
+HASH_WORKERS = 4
+# 引擎不支持、需要先解码转换的图片格式
+ENGINE_UNSUPPORTED_FORMATS = {'.avif', '.heic', '.heif'}
+# 预处理：长边超过该像素数的图片先缩小再交给引擎（None 表示不缩放）
+OCR_MAX_SIDE: Optional[int] = None
+
+# 看门狗：单张图片的识别超时（秒），超时视为引擎卡死并强制重启
+OCR_REQUEST_TIMEOUT = 60.0
+# 引擎初始化（加载模型）的超时（秒）
+ENGINE_INIT_TIMEOUT = 120.0
+# 看门狗检查间隔（秒）
+WATCHDOG_INTERVAL = 0.5
+# 引擎连续重启的最大次数（期间收到任何正常响应即清零），超过后放弃该引擎
+ENGINE_MAX_RESTARTS = 5
+# 重启退避：第 n 次连续重启前等待 min(BASE * 2^(n-1), MAX) 秒
+RESTART_BACKOFF_BASE = 0.5
+RESTART_BACKOFF_MAX = 30.0
+# 同一张图片导致引擎崩溃 / 超时达到该次数后放入隔离列表，不再重试
+POISON_THRESHOLD = 2
+
+# 每张图片最多保留的识别行数（限制单张图片结构化结果的内存占用）
+OCR_MAX_LINES_PER_PAGE = 512
+
+# 匹配文本过滤：置信度低于该值的行（水印、噪点等）不参与匹配
+MATCH_MIN_SCORE = 0.5
+# 匹配文本预算：按阅读顺序最多保留的行数与字符数（相似度计算的耗时随文本长度增长）
+MATCH_MAX_LINES = 60
+MATCH_MAX_CHARS = 1000
+
+# 匹配文本规范化时是否把繁体字折叠为简体（需要 opencc；A/B 两组繁简混用时开启）
+TEXT_FOLD_VARIANTS = False
+
+# 匹配键提取规则（写法见 MatchKeyRule.parse）：从页码、题号、章节编号等提取匹配键，
+# A/B 两组匹配键相同的图片直接配对，都没有匹配键或找不到相同的键时才比较整页文本
+MATCH_KEY_RULES: List[str] = []
+
+# 候选生成：按字符 n-gram（默认二元组，适合中日韩文本）建立 A 组倒排索引，
+# 每张 B 组图片只对共享 n-gram 最多的前 MATCH_TOP_K 张 A 组图片计算精确相似度
+NGRAM_SIZE = 2
+MATCH_TOP_K = 20
+# 排序时只查询 B 组文本中最罕见的若干个 n-gram：罕见的 n-gram 区分度最高，
+# 页眉、常用字等出现在大量 A 组图片中的 n-gram 几乎不影响排序，却占去大部分计数开销
+NGRAM_QUERY_LIMIT = 48
+# 候选列表缓存保留前 MATCH_TOP_K × CANDIDATE_ROW_SLACK 名：占用关系变化时从中补足 top_k 个未被占用的候选，
+# 用完时才按当前占用关系重新排序
+CANDIDATE_ROW_SLACK = 4
+
+# 候选索引模式："ngram" 为 n-gram 倒排索引；"lsh" 为 MinHash 签名 + 分段 LSH，
+# 每张 A 组图片只登记 LSH_BANDS 个固定的分段键（n-gram 索引要登记文本中的每个 n-gram），适合十万张以上的参考库；
+# "auto" 在 A 组达到 LSH_AUTO_MIN_SIZE 张时使用 lsh，否则使用 ngram
+MATCH_INDEX_MODE = "auto"
+LSH_AUTO_MIN_SIZE = 50000
+# MinHash 签名长度与 LSH 分段数（每段 MINHASH_PERMUTATIONS / LSH_BANDS 个值）：
+# 分段越多召回率越高、候选也越多，可用 lsh_candidate_probability() 或 benchmarks/bench_match.py 评估
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32
+MINHASH_SEED = 20240601
+
+# 尺寸限制的容差：宽、高的相对差都不超过该比例即视为尺寸相同（0 表示必须完全相同），
+# 用于不同设备截图分辨率略有差异的情况
+SIZE_TOLERANCE = 0.0
+
+# 一对一分配方式：
+# "optimal" 在候选相似度构成的稀疏二分图上求总相似度最大的一对一匹配（按连通分量分别求解）；
+# "global_greedy" 按相似度从高到低依次确定配对，与 B 组顺序无关、速度最快；
+# "sequential" 按 B 组到达顺序逐张选取当前最佳（早到的 B 组图片可能抢走更适合后来者的 A 组图片）
+MATCH_ASSIGNMENT = "optimal"
+# 单个连通分量较小一侧超过该图片数时改用 global_greedy（匈牙利算法为立方复杂度）
+ASSIGNMENT_MAX_COMPONENT = 2000 if SCIPY_AVAILABLE else 200
+
+# 一行识别结果：(文本, 四点框 [[x, y], ...], 置信度)
+OCRLine = Tuple[str, list, float]
+# 预处理对坐标的变换：(缩放比例, 裁剪起点 x, 裁剪起点 y)，用于把识别框换算回原图
+ImageTransform = Tuple[float, int, int]
+IDENTITY_TRANSFORM: ImageTransform = (1.0, 0, 0)
+
+
+class ROITemplate:
+    """
+    识别区域模板：只对图片中的一块相对区域做 OCR（例如截图的标题栏）。
+    
+    坐标均为相对值（0~1）：left, top, right, bottom。支持的文本写法：
+    - "full" / ""：全图（解析结果为 None）
+    - "top:20"：顶部 20% 的横条
+    - "rect:0,0.1,1,0.3"：任意相对矩形
+    """
+    
+    def __init__(self, left: float, top: float, right: float, bottom: float):
+        left, right = sorted((min(max(left, 0.0), 1.0), min(max(right, 0.0), 1.0)))
+        top, bottom = sorted((min(max(top, 0.0), 1.0), min(max(bottom, 0.0), 1.0)))
+        if right - left <= 0 or bottom - top <= 0:
+            raise ValueError("识别区域的宽高必须大于 0")
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+    
+    @classmethod
+    def top_percent(cls, percent: float) -> "ROITemplate":
+        return cls(0.0, 0.0, 1.0, percent / 100.0)
+    
+    @classmethod
+    def parse(cls, spec: str) -> Optional["ROITemplate"]:
+        spec = (spec or "").strip().lower()
+        if spec in ("", "full"):
+            return None
+        kind, _, value = spec.partition(":")
+        if kind == "top":
+            return cls.top_percent(float(value.rstrip("%")))
+        if kind == "rect":
+            parts = [float(x) for x in value.split(",")]
+            if len(parts) != 4:
+                raise ValueError(f"识别区域格式错误: {spec}")
+            return cls(*parts)
+        raise ValueError(f"无法识别的区域模板: {spec}")
+    
+    def key(self) -> str:
+        """稳定的文本表示，用于缓存键"""
+        return f"rect:{self.left:g},{self.top:g},{self.right:g},{self.bottom:g}"
+    
+    def crop_box(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        """换算为像素裁剪框 (left, top, right, bottom)"""
+        box = (
+            int(self.left * width), int(self.top * height),
+            int(round(self.right * width)), int(round(self.bottom * height)),
+        )
+        return box[0], box[1], max(box[2], box[0] + 1), max(box[3], box[1] + 1)
+    
+    def __repr__(self):
+        return f"ROITemplate({self.key()})"
+
+
+def default_pool_size(engine_threads: int = ENGINE_CPU_THREADS) -> int:
+    """默认引擎进程数：CPU 核心数 / 单个引擎的线程数，至少 1 个"""
+    cores = os.cpu_count() or 1
+    return max(1, cores // max(1, engine_threads))
+
+
+def flatten_to_rgb(img: "Image.Image") -> "Image.Image":
+    """把带透明通道 / 调色板等模式的图片铺到白底上，统一转换为 RGB"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        rgb_img.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return rgb_img
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def encode_image_for_engine(img: "Image.Image") -> bytes:
+    """将已解码的图片编码为 PNG 字节，使用最快的压缩级别（只在进程间传递，不需要压缩率）"""
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def needs_conversion(img_path: str) -> bool:
+    """图片格式是否需要先转换才能交给引擎"""
+    return Path(img_path).suffix.lower() in ENGINE_UNSUPPORTED_FORMATS
+
+
+def convert_image_file(img_path: str) -> bytes:
+    """解码图片、去除透明通道并编码为 PNG 字节（顶层函数，可在子进程中执行）"""
+    with Image.open(img_path) as img:
+        return encode_image_for_engine(flatten_to_rgb(img))
+
+
+def prepare_image_file(
+    img_path: str,
+    max_side: Optional[int] = None,
+    roi: Optional[ROITemplate] = None,
+) -> Optional[Tuple[bytes, ImageTransform]]:
+    """
+    OCR 前的预处理（顶层函数，可在子进程中执行）。
+    
+    - 设置了识别区域时只保留该区域；
+    - （裁剪后的）长边超过 max_side 时等比缩小；JPEG 借助 draft() 只解码到所需的 DCT 缩放级别
+      （1/2、1/4、1/8），大幅减少解码量；
+    - 引擎不支持的格式转换为 PNG。
+    
+    返回 (PNG 字节, 坐标变换)，无需任何处理时返回 None（由引擎直接读取原文件）。
+    """
+    with Image.open(img_path) as img:
+        width, height = img.size
+        crop = roi.crop_box(width, height) if roi else (0, 0, width, height)
+        crop_w, crop_h = crop[2] - crop[0], crop[3] - crop[1]
+        long_side = max(crop_w, crop_h)
+        too_large = bool(max_side) and long_side > max_side
+        if roi is None and not too_large and not needs_conversion(img_path):
+            return None
+        
+        ratio = max_side / long_side if too_large else 1.0
+        if too_large and img.format == 'JPEG':
+            img.draft('RGB', (max(1, round(width * ratio)), max(1, round(height * ratio))))
+        # draft() 之后图片尺寸可能已按 DCT 级别缩小，裁剪框随之换算
+        factor = img.size[0] / width
+        img = flatten_to_rgb(img)
+        if roi is not None:
+            img = img.crop(tuple(round(v * factor) for v in crop))
+        target = (max(1, round(crop_w * ratio)), max(1, round(crop_h * ratio)))
+        if img.size != target:
+            img = img.resize(target, Image.BILINEAR)
+        return encode_image_for_engine(img), (target[0] / crop_w, crop[0], crop[1])
+
+
+def rescale_lines(lines: List[OCRLine], transform: ImageTransform) -> List[OCRLine]:
+    """把在裁剪 / 缩小后的图上得到的文本框坐标换算回原图坐标"""
+    scale, offset_x, offset_y = transform
+    if transform == IDENTITY_TRANSFORM:
+        return lines
+    return [
+        (text, [[round(x / scale) + offset_x, round(y / scale) + offset_y] for x, y in box], score)
+        for text, box, score in lines
+    ]
+
+
+def lines_to_text(lines: List[OCRLine]) -> str:
+    """按行拼接识别文本"""
+    return "\n".join(text for text, _box, _score in lines)
+
+
+class OCRPage:
+    """
+    单张图片的结构化识别结果，按列存放在紧凑的 array 中（不为每一行创建 dict / tuple）。
+    
+    - text：全部行以换行连接的文本，匹配直接使用
+    - 每行在 text 中的结束位置、四点框坐标（每行 8 个整数，相对原图）、置信度各占一列
+    
+    每行的额外开销约 40 字节，且行数不超过 OCR_MAX_LINES_PER_PAGE，十万张图片的会话内存也有上界。
+    """
+    __slots__ = ("text", "_ends", "_boxes", "_scores")
+    
+    # 持久化格式：魔数 + 行数，随后依次为结束位置、文本框、置信度三列（小端序）
+    _HEADER = struct.Struct("<4sI")
+    _MAGIC = b"OCP1"
+    
+    def __init__(self, text: str = "", ends=None, boxes=None, scores=None):
+        self.text = text
+        self._ends = ends if ends is not None else array("I")
+        self._boxes = boxes if boxes is not None else array("i")
+        self._scores = scores if scores is not None else array("f")
+    
+    @classmethod
+    def from_lines(cls, lines: List[OCRLine]) -> "OCRPage":
+        """由引擎返回的逐行结果构建"""
+        ends, boxes, scores = array("I"), array("i"), array("f")
+        parts = []
+        offset = 0
+        for text, box, score in lines[:OCR_MAX_LINES_PER_PAGE]:
+            if parts:
+                offset += 1  # 行间的换行符
+            parts.append(text)
+            offset += len(text)
+            ends.append(offset)
+            points = [int(round(v)) for point in box[:4] for v in point[:2]]
+            boxes.extend(points + [0] * (8 - len(points)))
+            scores.append(score)
+        return cls("\n".join(parts), ends, boxes, scores)
+    
+    @classmethod
+    def from_text(cls, text: str) -> "OCRPage":
+        """只有文本时（旧版缓存记录）按行拆分，文本框记为空、置信度记为 1"""
+        lines = [(line, [], 1.0) for line in text.split("\n")] if text else []
+        return cls.from_lines(lines)
+    
+    def __len__(self) -> int:
+        return len(self._ends)
+    
+    def __bool__(self) -> bool:
+        return bool(self.text)
+    
+    def line_text(self, i: int) -> str:
+        start = self._ends[i - 1] + 1 if i else 0
+        return self.text[start:self._ends[i]]
+    
+    def box(self, i: int) -> list:
+        """第 i 行的四点框 [[x, y], ...]；没有坐标时为空列表"""
+        b = self._boxes[8 * i:8 * i + 8]
+        if not any(b):
+            return []
+        return [[b[0], b[1]], [b[2], b[3]], [b[4], b[5]], [b[6], b[7]]]
+    
+    def score(self, i: int) -> float:
+        return self._scores[i]
+    
+    def line(self, i: int) -> OCRLine:
+        return self.line_text(i), self.box(i), self.score(i)
+    
+    def lines(self) -> List[OCRLine]:
+        return [self.line(i) for i in range(len(self))]
+    
+    def match_text(
+        self,
+        min_score: Optional[float] = None,
+        max_lines: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ) -> str:
+        """
+        用于匹配的文本：去掉置信度低于 min_score 的行和空行，再按阅读顺序截取到行数 / 字符数预算以内。
+        参数为 None 时使用调用时的 MATCH_MIN_SCORE / MATCH_MAX_LINES / MATCH_MAX_CHARS（运行中修改也生效）。
+        """
+        min_score = MATCH_MIN_SCORE if min_score is None else min_score
+        max_lines = MATCH_MAX_LINES if max_lines is None else max_lines
+        max_chars = MATCH_MAX_CHARS if max_chars is None else max_chars
+        parts = []
+        total = 0
+        for i in range(len(self)):
+            if self._scores[i] < min_score:
+                continue
+            text = self.line_text(i)
+            if not text.strip():
+                continue
+            room = max_chars - total - (1 if parts else 0)
+            if room <= 0 or len(parts) >= max_lines:
+                break
+            parts.append(text[:room])
+            total += len(parts[-1]) + (1 if len(parts) > 1 else 0)
+        return "\n".join(parts)
+    
+    def mean_score(self) -> float:
+        """平均置信度（没有文字时为 0）"""
+        return sum(self._scores) / len(self._scores) if self._scores else 0.0
+    
+    @property
+    def nbytes(self) -> int:
+        """按列数据与文本占用的字节数（近似值，不含对象头）"""
+        return (
+            len(self.text) * 2
+            + len(self._ends) * self._ends.itemsize
+            + len(self._boxes) * self._boxes.itemsize
+            + len(self._scores) * self._scores.itemsize
+        )
+    
+    def pack_layout(self) -> bytes:
+        """把文本框与置信度等按列数据序列化（文本单独存放），用于持久化缓存"""
+        columns = [array(c.typecode, c) for c in (self._ends, self._boxes, self._scores)]
+        if sys.byteorder != "little":
+            for column in columns:
+                column.byteswap()
+        return self._HEADER.pack(self._MAGIC, len(self)) + b"".join(c.tobytes() for c in columns)
+    
+    @classmethod
+    def from_packed(cls, text: str, data: Optional[bytes]) -> "OCRPage":
+        """由文本与 pack_layout() 的结果还原；数据缺失或格式不符时退回按行拆分文本"""
+        if not data or len(data) < cls._HEADER.size:
+            return cls.from_text(text)
+        magic, count = cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC:
+            return cls.from_text(text)
+        columns = []
+        offset = cls._HEADER.size
+        for typecode, width in (("I", 1), ("i", 8), ("f", 1)):
+            column = array(typecode)
+            size = column.itemsize * width * count
+            column.frombytes(data[offset:offset + size])
+            offset += size
+            columns.append(column)
+        if sys.byteorder != "little":
+            for column in columns:
+                column.byteswap()
+        return cls(text, *columns)
+    
+    def __repr__(self):
+        return f"OCRPage({len(self)} 行, {len(self.text)} 字)"
+
+
+class OCRResultStore:
+    """
+    按图片路径保存结构化识别结果（OCRPage），供匹配逻辑与界面查询文本框、置信度等信息。
+    
+    只在主线程中读写（结果通过 OCRWorker 的信号送达），不需要加锁。
+    """
+    
+    def __init__(self):
+        self._pages: Dict[str, OCRPage] = {}
+    
+    def put(self, img_path: str, page: OCRPage):
+        self._pages[img_path] = page
+    
+    def page(self, img_path: str) -> Optional[OCRPage]:
+        return self._pages.get(img_path)
+    
+    def text(self, img_path: str) -> str:
+        page = self._pages.get(img_path)
+        return page.text if page else ""
+    
+    def lines(self, img_path: str) -> List[OCRLine]:
+        page = self._pages.get(img_path)
+        return page.lines() if page else []
+    
+    def move(self, old_path: str, new_path: str):
+        """图片重命名后同步路径"""
+        page = self._pages.pop(old_path, None)
+        if page is not None:
+            self._pages[new_path] = page
+    
+    def discard(self, img_path: str):
+        self._pages.pop(img_path, None)
+    
+    def clear(self):
+        self._pages.clear()
+    
+    def __contains__(self, img_path: str) -> bool:
+        return img_path in self._pages
+    
+    def __len__(self) -> int:
+        return len(self._pages)
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(page.nbytes for page in self._pages.values())
+
+
+class _EngineRequest:
+    """发往引擎的一个请求：写入 stdin 的一行 JSON、调用方的 Future、图片标识（用于隔离）与失败次数"""
+    __slots__ = ("payload", "future", "label", "attempts")
+    
+    def __init__(self, payload: bytes, future: Future, label: Optional[str] = None):
+        self.payload = payload
+        self.future = future
+        self.label = label
+        # 该请求在引擎中处理时引擎崩溃 / 超时的次数
+        self.attempts = 0
+
+
+class OCRController:
+    """直接控制 OCR 引擎
+    
+    同一个引擎进程的 stdin/stdout 由专用的写线程和读线程独占：
+    调用方只往请求队列里放请求并拿到 Future，写线程按顺序写入 stdin，
+    读线程按顺序读取 stdout。PaddleOCR-json 严格按输入顺序逐行输出结果，
+    因此按 FIFO 顺序即可把每一行响应对应回发出它的请求，多个线程可以安全地共用同一个引擎。
+    
+    流水线模式：写线程最多让 max_inflight 个请求同时在引擎中排队，
+    引擎识别完一张后无需等待 Python 侧解析、转换下一张，即可直接开始下一张。
+    
+    看门狗：队首请求（引擎正在识别的那张）超过 request_timeout 没有结果即视为卡死，强制结束引擎；
+    引擎崩溃或被结束后按指数退避自动重启，在途请求重新排队。队首请求被记一次失败，
+    同一张图片累计 POISON_THRESHOLD 次导致引擎崩溃 / 超时后放入隔离列表，不再重试。
+    """
+    
+    def __init__(
+        self,
+        exe_path,
+        cpu_threads: Optional[int] = None,
+        max_inflight: int = PIPELINE_DEPTH,
+        request_timeout: float = OCR_REQUEST_TIMEOUT,
+        quarantine: Optional[Dict[str, str]] = None,
+    ):
+        self.exe_path = os.path.abspath(exe_path)
+        self.proc = None
+        self.exe_dir = os.path.dirname(self.exe_path)
+        # 为 None 时沿用引擎自身的默认线程数
+        self.cpu_threads = cpu_threads
+        self.request_timeout = request_timeout
+        # 隔离列表：图片路径 -> 原因；引擎池中的多个引擎共用同一个字典
+        self.quarantine: Dict[str, str] = quarantine if quarantine is not None else {}
+        # 请求队列；None 表示停止写线程
+        self._requests: "queue.Queue[Optional[_EngineRequest]]" = queue.Queue()
+        # 已写入引擎、等待响应的请求（按写入顺序），队首即引擎正在识别的请求
+        self._pending: "deque[_EngineRequest]" = deque()
+        self._pending_lock = threading.Lock()
+        # 队首请求开始被引擎处理的时间（看门狗据此判断超时）
+        self._head_since = 0.0
+        # 在途请求窗口：写线程写入前占用一个名额，读线程拿到响应后归还
+        self.max_inflight = max(1, max_inflight)
+        self._window = threading.Semaphore(self.max_inflight)
+        # 引擎已输出初始化完成提示、可以接收请求（重启期间为未就绪）
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        # 引擎是否曾经初始化成功：首次启动失败直接报错，之后的退出才自动重启
+        self._started = False
+        self._spawned_at = 0.0
+        # 连续重启次数（收到任何正常响应即清零）
+        self._restarts = 0
+        # 看门狗主动结束引擎时记录原因，便于日志区分崩溃与超时
+        self._kill_reason: Optional[str] = None
+        # 重启次数耗尽或首次初始化失败后引擎不再可用
+        self.dead = False
+        self.init_error: Optional[Exception] = None
+        self._writer: Optional[threading.Thread] = None
+        self._watchdog: Optional[threading.Thread] = None
+    
+    def start(self):
+        """启动 OCR 引擎（阻塞直到初始化完成）"""
+        self.launch()
+        if not self.wait_ready(ENGINE_INIT_TIMEOUT):
+            error = self.init_error or Exception(f"OCR引擎初始化超时（{ENGINE_INIT_TIMEOUT:g} 秒）")
+            self.stop()
+            raise error
+        print("[OCR初始化] 引擎就绪")
+    
+    def launch(self):
+        """启动引擎进程后立即返回，模型在后台加载；加载期间提交的请求会排队，就绪后自动写入引擎"""
+        if not os.path.exists(self.exe_path):
+            raise FileNotFoundError(f"OCR引擎不存在: {self.exe_path}")
+        
+        models_dir = os.path.join(self.exe_dir, "models")
+        if not os.path.exists(models_dir):
+            raise FileNotFoundError(f"模型文件夹不存在: {models_dir}")
+        
+        print("[OCR初始化] 等待引擎初始化...")
+        self._spawn()
+        self._writer = threading.Thread(target=self._write_loop, name="ocr-writer", daemon=True)
+        self._watchdog = threading.Thread(target=self._watch_loop, name="ocr-watchdog", daemon=True)
+        self._writer.start()
+        self._watchdog.start()
+    
+    @property
+    def ready(self) -> bool:
+        """引擎是否已完成初始化、可以立即处理请求（重启期间为 False）"""
+        return self._ready.is_set()
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待引擎就绪；引擎已不可用或超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._ready.wait(0.1):
+            if self.dead or self._stop_event.is_set():
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+    
+    def _spawn(self):
+        """启动一个新的引擎进程，并为其启动读线程（读线程负责识别初始化完成的提示）"""
+        startupinfo = None
+        if sys.platform == "win32":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags = (
+                subprocess.CREATE_NEW_CONSOLE | subprocess.STARTF_USESHOWWINDOW
+            )
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+        
+        args = [self.exe_path]
+        if self.cpu_threads:
+            args.append(f"--cpu_threads={self.cpu_threads}")
+        
+        try:
+            proc = subprocess.Popen(
+                args,
+                cwd=self.exe_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                startupinfo=startupinfo,
+            )
+        except Exception as e:
+            raise Exception(f"无法启动OCR引擎进程: {e}")
+        
+        self._kill_reason = None
+        self._spawned_at = time.monotonic()
+        self.proc = proc
+        reader = threading.Thread(target=self._read_loop, args=(proc,), name="ocr-reader", daemon=True)
+        reader.start()
+    
+    def convert_image_if_needed(self, img_path) -> Optional[bytes]:
+        """如果图片格式不被引擎支持，在内存中解码并编码为 PNG 字节；支持的格式返回 None（引擎直接读文件）"""
+        abs_img_path = os.path.abspath(img_path)
+        
+        if needs_conversion(abs_img_path):
+            try:
+                data = convert_image_file(abs_img_path)
+                print(f"[格式转换] {Path(abs_img_path).suffix.lower()} -> PNG(内存): {os.path.basename(img_path)}")
+                return data
+            except Exception as e:
+                print(f"[格式转换失败] {os.path.basename(img_path)}: {e}")
+        
+        return None
+    
+    def submit(self, img_path) -> Future:
+        """提交一张图片的识别请求，返回 Future（结果为逐行的 OCRLine 列表），可被多个线程同时调用"""
+        if self.dead or self._stop_event.is_set():
+            return self._failed_future(Exception("OCR引擎不可用"))
+        
+        abs_img_path = os.path.abspath(img_path)
+        if not os.path.exists(abs_img_path):
+            return self._done_future([])
+        if abs_img_path in self.quarantine:
+            return self._failed_future(Exception(f"图片已隔离：{self.quarantine[abs_img_path]}"))
+        
+        converted = self.convert_image_if_needed(abs_img_path)
+        if converted is not None:
+            # 转换后的图片直接以内存数据交给引擎，不落地临时文件
+            return self.submit_bytes(converted, label=abs_img_path)
+        
+        writeDict = {"image_path": abs_img_path}
+        return self._enqueue(writeDict, abs_img_path)
+    
+    def submit_bytes(self, image_bytes: bytes, label: Optional[str] = None) -> Future:
+        """提交已编码的图片数据（PNG/JPEG 等），通过 stdin 以 base64 传给引擎，不经过文件系统
+        
+        label 为对应的原图路径（可选），用于日志和隔离列表。
+        """
+        if self.dead or self._stop_event.is_set():
+            return self._failed_future(Exception("OCR引擎不可用"))
+        writeDict = {"image_base64": base64.b64encode(image_bytes).decode("ascii")}
+        return self._enqueue(writeDict, label)
+    
+    def submit_image(self, img) -> Future:
+        """提交已解码的 PIL 图片（例如裁剪、缩放后的结果）"""
+        return self.submit_bytes(encode_image_for_engine(flatten_to_rgb(img)))
+    
+    def _enqueue(self, writeDict: dict, label: Optional[str] = None) -> Future:
+        future = Future()
+        writeStr = json.dumps(writeDict, ensure_ascii=True) + "\n"
+        self._requests.put(_EngineRequest(writeStr.encode("utf-8"), future, label))
+        return future
+    
+    @staticmethod
+    def _done_future(lines: List[OCRLine]) -> Future:
+        future = Future()
+        future.set_result(lines)
+        return future
+    
+    @staticmethod
+    def _failed_future(error: Exception) -> Future:
+        future = Future()
+        future.set_exception(error)
+        return future
+    
+    def get_text(self, img_path):
+        """识别图片并提取文本"""
+        try:
+            return lines_to_text(self.submit(img_path).result())
+        except Exception as e:
+            print(f"[OCR错误] 识别异常 {os.path.basename(img_path)}: {e}")
+            return ""
+    
+    @staticmethod
+    def _parse_response(getStr: str) -> List[OCRLine]:
+        """解析引擎返回的一行 JSON，提取逐行的文本、文本框与置信度"""
+        try:
+            data = json.loads(getStr)
+        except json.JSONDecodeError:
+            raise Exception(f"无法解析引擎输出: {getStr[:80]}")
+        code = data.get("code")
+        if code == 100:
+            lines = []
+            for item in data.get("data", []):
+                if isinstance(item, dict) and "text" in item:
+                    lines.append((item["text"], item.get("box") or [], float(item.get("score", 0.0))))
+            return lines
+        if code == 101:
+            # 图片中没有文字
+            return []
+        # 其余为引擎报错（图片无法读取等），以异常返回，避免被当作“无文字”写入缓存
+        raise Exception(f"引擎返回错误 code={code}: {data.get('data')}")
+    
+    def _write_loop(self):
+        """写线程：逐个取出请求写入 stdin，先登记到等待队列再写，保证读线程能对上号
+        
+        写线程跨越引擎重启一直存在：引擎未就绪（启动 / 重启中）时请求在这里等待。
+        """
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            future = request.future
+            # 等待在途窗口有空位，保证引擎 stdin 中排队的请求数有上限
+            self._window.acquire()
+            # 重启后重新排队的请求已处于运行状态
+            if not future.running() and not future.set_running_or_notify_cancel():
+                self._window.release()
+                continue
+            proc = None
+            while proc is None:
+                with self._pending_lock:
+                    # 就绪标记与等待队列在同一把锁下检查，避免把请求登记到已退出的引擎上
+                    if self._ready.is_set():
+                        proc = self.proc
+                        if not self._pending:
+                            self._head_since = time.monotonic()
+                        self._pending.append(request)
+                        break
+                if self.dead or self._stop_event.is_set():
+                    break
+                self._ready.wait(0.2)
+            if proc is None:
+                self._window.release()
+                future.set_exception(self.init_error or Exception("OCR引擎不可用"))
+                continue
+            try:
+                proc.stdin.write(request.payload)
+                proc.stdin.flush()
+            except Exception:
+                # 管道已断开说明引擎正在退出：请求留在等待队列中，由读线程在重启时重新排队
+                pass
+        # 写线程退出后，队列中剩余的请求不会再被处理
+        self._fail_queued(Exception("OCR引擎已停止"))
+    
+    def _read_loop(self, proc):
+        """读线程（每个引擎进程一个）：先等待初始化完成，再逐行读取 stdout，按 FIFO 顺序把结果交给对应的 Future"""
+        while True:
+            try:
+                line = proc.stdout.readline()
+            except Exception:
+                line = b""
+            if not line:
+                break
+            getStr = line.decode("utf-8", errors="ignore").strip()
+            if not self._ready.is_set():
+                if "OCR init completed." in getStr or "初始化完成" in getStr:
+                    print("[OCR初始化] 引擎初始化成功！")
+                    self._started = True
+                    with self._pending_lock:
+                        self._ready.set()
+                continue
+            # 引擎偶尔输出的非 JSON 日志行不对应任何请求
+            if not getStr.startswith("{"):
+                continue
+            with self._pending_lock:
+                request = self._pending.popleft() if self._pending else None
+                self._head_since = time.monotonic()
+            if request is not None:
+                self._window.release()
+                self._restarts = 0
+                try:
+                    request.future.set_result(self._parse_response(getStr))
+                except Exception as e:
+                    request.future.set_exception(e)
+        self._on_engine_exit(proc)
+    
+    def _on_engine_exit(self, proc):
+        """引擎进程退出（崩溃、被看门狗结束或被停止）：处理在途请求，必要时按退避时间重启引擎"""
+        try:
+            proc.wait(timeout=5)
+        except Exception:
+            pass
+        with self._pending_lock:
+            self._ready.clear()
+            drained = list(self._pending)
+            self._pending.clear()
+        for _ in drained:
+            self._window.release()
+        
+        if self._stop_event.is_set():
+            error = Exception("OCR引擎已停止")
+            for request in drained:
+                request.future.set_exception(error)
+            return
+        
+        reason = self._kill_reason or f"进程退出 code={proc.returncode}"
+        if not self._started:
+            # 从未初始化成功（模型缺失、依赖缺失等），重启也无济于事
+            self.dead = True
+            self.init_error = Exception(f"OCR引擎初始化失败：{reason}")
+            for request in drained:
+                request.future.set_exception(self.init_error)
+            self._fail_queued(self.init_error)
+            return
+        
+        if drained:
+            # 引擎按顺序识别，队首请求就是引擎出事时正在处理的图片
+            suspect = drained[0]
+            suspect.attempts += 1
+            name = os.path.basename(suspect.label) if suspect.label else "<内存图片>"
+            if suspect.attempts >= POISON_THRESHOLD:
+                message = f"连续 {suspect.attempts} 次导致引擎{reason}"
+                if suspect.label:
+                    self.quarantine[suspect.label] = message
+                print(f"[OCR看门狗] 隔离图片 {name}：{message}")
+                suspect.future.set_exception(Exception(f"图片已隔离：{message}"))
+                drained = drained[1:]
+            else:
+                print(f"[OCR看门狗] 引擎在识别 {name} 时{reason}，将重试")
+        # 其余在途请求与引擎故障无关，重新排队
+        for request in drained:
+            self._requests.put(request)
+        
+        while not self._stop_event.is_set():
+            self._restarts += 1
+            if self._restarts > ENGINE_MAX_RESTARTS:
+                self.dead = True
+                self.init_error = Exception(f"OCR引擎连续重启 {ENGINE_MAX_RESTARTS} 次仍失败，已放弃")
+                print(f"[OCR看门狗] {self.init_error}")
+                self._fail_queued(self.init_error)
+                return
+            delay = min(RESTART_BACKOFF_BASE * 2 ** (self._restarts - 1), RESTART_BACKOFF_MAX)
+            print(f"[OCR看门狗] 引擎{reason}，{delay:g} 秒后第 {self._restarts} 次重启")
+            if self._stop_event.wait(delay):
+                break
+            try:
+                self._spawn()
+                return
+            except Exception as e:
+                reason = f"启动失败（{e}）"
+        # 重启等待期间被停止
+        self._fail_queued(Exception("OCR引擎已停止"))
+    
+    def _watch_loop(self):
+        """看门狗线程：识别超时或初始化超时时强制结束引擎，由读线程负责重启（首次初始化超时则判定引擎不可用）"""
+        while not self._stop_event.wait(WATCHDOG_INTERVAL):
+            proc = self.proc
+            if proc is None or self.dead or proc.poll() is not None:
+                continue
+            now = time.monotonic()
+            if self._ready.is_set():
+                with self._pending_lock:
+                    busy = bool(self._pending)
+                    since = self._head_since
+                if not busy or now - since <= self.request_timeout:
+                    continue
+                reason = f"识别超时（{self.request_timeout:g} 秒）"
+            elif now - self._spawned_at > ENGINE_INIT_TIMEOUT:
+                reason = f"初始化超时（{ENGINE_INIT_TIMEOUT:g} 秒）"
+            else:
+                continue
+            self._kill_reason = reason
+            try:
+                proc.kill()
+            except Exception:
+                pass
+    
+    def _fail_queued(self, error: Exception):
+        """让请求队列中尚未写入的请求全部失败，避免调用方永久等待"""
+        got_stop = False
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                got_stop = True
+            elif request.future.running() or request.future.set_running_or_notify_cancel():
+                request.future.set_exception(error)
+        # 停止标记要留给写线程
+        if got_stop:
+            self._requests.put(None)
+    
+    def stop(self):
+        """停止 OCR 引擎"""
+        self._stop_event.set()
+        self._requests.put(None)
+        proc = self.proc
+        if proc:
+            try:
+                proc.kill()
+            except:
+                pass
+            self.proc = None
+
+
+class ImageConversionStage:
+    """
+    后台格式转换 / 预处理阶段：在进程池中解码 AVIF/HEIC 等格式、去除透明通道、
+    按需缩小超大图片并编码为 PNG，避开 GIL，也不占用引擎的取任务线程。
+    
+    转换结果按内容哈希缓存（总大小受 max_bytes 限制），同一张照片同时出现在 A、B 组时只转换一次；
+    同一内容正在转换时，后来的请求直接复用进行中的 Future。
+    """
+    
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_bytes: int = 128 * 1024 * 1024,
+        max_side: Optional[int] = OCR_MAX_SIDE,
+    ):
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 1) // 2))
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 值为 prepare_image_file 的返回值：(PNG 字节, 坐标变换) 或 None（无需处理）
+        self._converted: "OrderedDict[str, Optional[Tuple[bytes, ImageTransform]]]" = OrderedDict()
+        self._converted_bytes = 0
+        self._in_flight: Dict[str, Future] = {}
+    
+    @staticmethod
+    def _cache_key(img_path: str, content_hash: Optional[str], roi: Optional[ROITemplate]) -> str:
+        if content_hash:
+            key = content_hash
+        else:
+            # 没有内容哈希时退化为按路径 + 大小 + 修改时间去重
+            st = os.stat(img_path)
+            key = f"{os.path.normcase(os.path.abspath(img_path))}|{st.st_size}|{st.st_mtime_ns}"
+        return f"{key}#{roi.key()}" if roi else key
+    
+    def needs_processing(self, img_path: str, roi: Optional[ROITemplate] = None) -> bool:
+        """是否需要经过本阶段：格式不受支持、设置了识别区域，或开启了缩放（需要读取尺寸判断）"""
+        return roi is not None or bool(self.max_side) or needs_conversion(img_path)
+    
+    def convert(self, img_path: str, content_hash: Optional[str] = None, roi: Optional[ROITemplate] = None) -> Future:
+        """提交转换任务，返回 Future（结果见 prepare_image_file）"""
+        key = self._cache_key(img_path, content_hash, roi)
+        with self._lock:
+            if key in self._converted:
+                self._converted.move_to_end(key)
+                future = Future()
+                future.set_result(self._converted[key])
+                return future
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            future = self._executor.submit(prepare_image_file, os.path.abspath(img_path), self.max_side, roi)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda f, k=key: self._on_converted(k, f))
+        return future
+    
+    def _on_converted(self, key: str, future: Future):
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            prepared = future.result()
+            self._converted[key] = prepared
+            self._converted_bytes += len(prepared[0]) if prepared else 0
+            while self._converted_bytes > self.max_bytes and len(self._converted) > 1:
+                _, old = self._converted.popitem(last=False)
+                self._converted_bytes -= len(old[0]) if old else 0
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class OCREnginePool:
+    """OCR 引擎池：启动多个引擎进程，A/B 组任务共用一个队列，空闲引擎主动拉取下一张图片"""
+    
+    def __init__(
+        self,
+        exe_path,
+        size: Optional[int] = None,
+        engine_threads: int = ENGINE_CPU_THREADS,
+        pipeline_depth: int = PIPELINE_DEPTH,
+        converter: Optional[ImageConversionStage] = None,
+    ):
+        self.exe_path = os.path.abspath(exe_path)
+        self.engine_threads = engine_threads
+        self.pipeline_depth = pipeline_depth
+        # 需要格式转换的图片先经过转换阶段，转换完成后才进入共享任务队列
+        self.converter = converter if converter is not None else ImageConversionStage()
+        self.size = size or default_pool_size(engine_threads)
+        self.controllers: List[OCRController] = []
+        # 隔离列表（图片路径 -> 原因），所有引擎共用：在任一引擎上反复导致崩溃的图片不再提交
+        self.quarantine: Dict[str, str] = {}
+        # 任务：(图片路径 或 已编码的图片字节, 原图路径, 坐标变换, Future)
+        self._jobs: "queue.Queue[Optional[Tuple[object, Optional[str], ImageTransform, Future]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        # 仍在工作的取任务线程数；引擎重启次数耗尽后对应线程退出
+        self._alive = 0
+        self._alive_lock = threading.Lock()
+    
+    def start(self, wait: bool = True):
+        """启动全部引擎进程；只要有一个启动成功即可工作
+        
+        wait=False 时不等待模型加载，立即返回：引擎在后台预热，期间提交的任务在共享队列中排队，
+        引擎就绪后自动开始处理。预热进度可通过 ready_count() / failed() 查询。
+        """
+        first_error = None
+        for i in range(self.size):
+            controller = OCRController(
+                self.exe_path, cpu_threads=self.engine_threads, max_inflight=self.pipeline_depth,
+                quarantine=self.quarantine,
+            )
+            try:
+                controller.launch()
+            except Exception as e:
+                print(f"[引擎池] 第 {i+1} 个引擎启动失败: {e}")
+                first_error = first_error or e
+                continue
+            self.controllers.append(controller)
+        
+        if not self.controllers:
+            raise first_error or Exception("OCR引擎池启动失败：没有可用的引擎")
+        
+        self._alive = len(self.controllers)
+        for i, controller in enumerate(self.controllers):
+            thread = threading.Thread(
+                target=self._engine_loop, args=(controller,),
+                name=f"ocr-engine-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        print(f"[引擎池] 已启动 {len(self.controllers)} 个引擎进程（每个 {self.engine_threads} 线程）")
+        
+        if wait:
+            self.wait_ready()
+            if self.failed():
+                error = self.controllers[0].init_error or Exception("OCR引擎池启动失败：没有可用的引擎")
+                self.stop()
+                raise error
+            print(f"[引擎池] {self.ready_count()} 个引擎已就绪")
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待全部引擎完成初始化（或确认失败）；至少一个引擎就绪时返回 True"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for controller in self.controllers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            controller.wait_ready(remaining)
+        return self.ready_count() > 0
+    
+    def ready_count(self) -> int:
+        """已完成初始化的引擎数"""
+        return sum(1 for controller in self.controllers if controller.ready)
+    
+    def failed(self) -> bool:
+        """全部引擎都已不可用（初始化失败或重启次数耗尽）"""
+        return all(controller.dead for controller in self.controllers)
+    
+    def submit(
+        self,
+        img_path: str,
+        content_hash: Optional[str] = None,
+        roi: Optional[ROITemplate] = None,
+    ) -> Future:
+        """提交一张图片，返回 Future，结果为逐行的 OCRLine 列表（文本框坐标均相对原图）
+        
+        需要裁剪 / 转换 / 缩放的图片先交给预处理阶段，处理好的 PNG 数据以内存方式进入任务队列，
+        引擎线程从不等待 PIL。设置了识别区域（roi）时必须启用预处理阶段。
+        """
+        future = Future()
+        if not self._alive:
+            future.set_exception(Exception("OCR引擎池中没有可用的引擎"))
+            return future
+        if os.path.abspath(img_path) in self.quarantine:
+            future.set_exception(Exception(f"图片已隔离：{self.quarantine[os.path.abspath(img_path)]}"))
+            return future
+        if self.converter is None and roi is not None:
+            future.set_exception(Exception("未启用预处理阶段，无法按识别区域裁剪"))
+            return future
+        if self.converter is not None and self.converter.needs_processing(img_path, roi):
+            try:
+                convert_future = self.converter.convert(img_path, content_hash, roi)
+            except Exception as e:
+                future.set_exception(e)
+                return future
+            convert_future.add_done_callback(
+                lambda f, p=img_path, r=roi, job_future=future: self._on_converted(p, f, job_future, r)
+            )
+            return future
+        self._jobs.put((img_path, img_path, IDENTITY_TRANSFORM, future))
+        return future
+    
+    def _on_converted(
+        self, img_path: str, convert_future: Future, job_future: Future, roi: Optional[ROITemplate] = None,
+    ):
+        """
+        预处理完成后把 PNG 数据放入共享任务队列；无需处理时交由引擎直接读取原文件。
+        
+        处理失败时：设置了识别区域的任务直接失败（整图的识别结果不能当作该区域的结果）；
+        只是格式转换 / 缩放失败的任务仍交由引擎读取原文件，并在 job_future.fallback 上标记，
+        调用方据此不把结果写入按预处理配置区分的持久化缓存。
+        """
+        if convert_future.cancelled():
+            job_future.cancel()
+            return
+        error = convert_future.exception()
+        if error is not None:
+            print(f"[格式转换失败] {os.path.basename(img_path)}: {error}")
+            if roi is not None:
+                job_future.set_exception(error)
+                return
+            job_future.fallback = True
+            self._jobs.put((img_path, img_path, IDENTITY_TRANSFORM, job_future))
+            return
+        prepared = convert_future.result()
+        if prepared is None:
+            self._jobs.put((img_path, img_path, IDENTITY_TRANSFORM, job_future))
+        else:
+            data, transform = prepared
+            self._jobs.put((data, os.path.abspath(img_path), transform, job_future))
+    
+    def submit_bytes(self, image_bytes: bytes) -> Future:
+        """提交内存中的图片数据（不经过文件系统）"""
+        future = Future()
+        self._jobs.put((image_bytes, None, IDENTITY_TRANSFORM, future))
+        return future
+    
+    def submit_image(self, img) -> Future:
+        """提交已解码的 PIL 图片"""
+        return self.submit_bytes(encode_image_for_engine(flatten_to_rgb(img)))
+    
+    def get_text(self, img_path: str) -> str:
+        """同步识别一张图片（阻塞直到结果返回）"""
+        return lines_to_text(self.submit(img_path).result())
+    
+    def _engine_loop(self, controller: OCRController):
+        """单个引擎的取任务循环：从共享队列拉取任务，谁空闲谁处理
+        
+        每个引擎最多同时领取 max_inflight 个任务：引擎识别当前图片时，本线程已在准备
+        （路径解析、格式转换）并提交下一张；其余任务留在共享队列中，交给其他空闲引擎。
+        """
+        slots = threading.Semaphore(controller.max_inflight)
+        while True:
+            slots.acquire()
+            job = self._jobs.get()
+            if job is None:
+                break
+            if controller.dead:
+                # 该引擎已放弃重启：任务交还共享队列，由其他引擎处理
+                self._jobs.put(job)
+                self._retire(controller)
+                break
+            source, label, transform, future = job
+            # 已被取消的任务（例如窗口关闭或线程中断）直接跳过；从失效引擎转回的任务已处于运行状态
+            if not future.running() and not future.set_running_or_notify_cancel():
+                slots.release()
+                continue
+            try:
+                if isinstance(source, bytes):
+                    engine_future = controller.submit_bytes(source, label=label)
+                else:
+                    engine_future = controller.submit(source)
+            except Exception as e:
+                slots.release()
+                future.set_exception(e)
+                continue
+            engine_future.add_done_callback(
+                lambda f, j=job, c=controller: self._relay_result(f, j, c, slots)
+            )
+    
+    def _retire(self, controller: OCRController):
+        """引擎不可用后退出其取任务线程；最后一个引擎也不可用时，让剩余任务全部失败"""
+        with self._alive_lock:
+            self._alive -= 1
+            remaining = self._alive
+        print(f"[引擎池] 一个引擎已不可用（{controller.init_error}），剩余 {remaining} 个")
+        if remaining > 0:
+            return
+        error = Exception("OCR引擎池中没有可用的引擎")
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None and job[-1].set_running_or_notify_cancel():
+                job[-1].set_exception(error)
+    
+    def _relay_result(self, engine_future: Future, job: tuple, controller: OCRController, slots: threading.Semaphore):
+        """把引擎返回的结果（坐标换算回原图）转交给调用方的 Future，并归还该引擎的任务名额"""
+        slots.release()
+        _source, _label, transform, job_future = job
+        error = engine_future.exception()
+        if error is not None and controller.dead and error is controller.init_error \
+                and any(not c.dead for c in self.controllers):
+            # 引擎放弃重启时仍在其上排队的任务，转交给其他仍可用的引擎
+            self._jobs.put(job)
+        elif error is not None:
+            job_future.set_exception(error)
+        else:
+            job_future.set_result(rescale_lines(engine_future.result(), transform))
+    
+    def stop(self):
+        """停止引擎池：取消尚未开始的任务，结束取任务线程并关闭所有引擎进程"""
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[-1].cancel()
+        for _ in self._threads:
+            self._jobs.put(None)
+        for controller in self.controllers:
+            controller.stop()
+        if self.converter is not None:
+            self.converter.shutdown()
+        self._threads = []
+        self.controllers = []
+
+
+def engine_config_key(exe_path: str, **options) -> str:
+    """
+    计算引擎 / 模型配置的指纹，作为缓存键的一部分。
+    
+    引擎目录名（含版本号）、引擎文件大小、models 下各配置文件的内容以及影响识别结果的
+    预处理选项（如 max_side）任意一项变化，旧的缓存结果都不再命中。
+    """
+    exe_path = os.path.abspath(exe_path)
+    exe_dir = os.path.dirname(exe_path)
+    digest = hashlib.sha1()
+    digest.update(os.path.basename(exe_dir).encode("utf-8"))
+    try:
+        digest.update(str(os.path.getsize(exe_path)).encode("ascii"))
+    except OSError:
+        pass
+    models_dir = os.path.join(exe_dir, "models")
+    try:
+        config_files = sorted(f for f in os.listdir(models_dir) if f.startswith("config"))
+    except OSError:
+        config_files = []
+    for name in config_files:
+        try:
+            with open(os.path.join(models_dir, name), "rb") as f:
+                digest.update(name.encode("utf-8"))
+                digest.update(f.read())
+        except OSError:
+            pass
+    for name in sorted(options):
+        digest.update(f"{name}={options[name]!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def hash_file_content(path: str) -> str:
+    """计算文件内容哈希（与文件名、所在文件夹无关）
+    
+    通过内存映射读取，哈希函数直接读取映射页面，大文件不会被整块复制到 Python 缓冲区。
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.hexdigest()
+
+
+class OCRResultCache:
+    """
+    持久化 OCR 结果缓存（SQLite，位于用户缓存目录）。
+    
+    以「图片内容哈希 + 引擎/模型配置指纹」为键，因此重命名、移动文件夹或不同文件夹中的同一张图片
+    都能命中；总大小超过 max_bytes 时按最近使用时间淘汰旧记录。
+    
+    另外记录每个文件的 (路径, 大小, mtime_ns, inode) 指纹及其内容哈希：指纹未变时直接复用哈希，
+    只有新文件或指纹变化的文件才需要完整读取并计算哈希。文件已不存在时删除对应记录；
+    记录数超过 max_fingerprints 时按写入先后淘汰最早的记录（被淘汰的文件下次重新计算哈希即可）。
+    """
+    
+    def __init__(
+        self, config_key: str, db_path: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024,
+        max_fingerprints: int = 200_000,
+    ):
+        self.config_key = config_key
+        self.db_path = db_path or os.path.join(get_cache_dir(), "ocr_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.max_fingerprints = max_fingerprints
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # OCRWorker 线程与主线程都会访问，统一用一把锁串行化
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            " content_hash TEXT NOT NULL,"
+            " config_key TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, config_key))"
+        )
+        # 结构化结果（文本框、置信度）按列序列化后存放在 page 列；旧版数据库没有该列时补上
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ocr_results)")}
+        if "page" not in columns:
+            self._conn.execute("ALTER TABLE ocr_results ADD COLUMN page BLOB")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_results_last_used ON ocr_results(last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_fingerprints ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " content_hash TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()
+        self._total_bytes = int(row[0])
+        self._fingerprint_count = self._conn.execute("SELECT COUNT(*) FROM file_fingerprints").fetchone()[0]
+    
+    def content_hash(self, path: str) -> str:
+        """获取文件内容哈希：stat 指纹未变化时直接复用，否则重新计算并记录"""
+        key = os.path.normcase(os.path.abspath(path))
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            # 文件已被删除 / 移走（例如重命名后的旧路径），它的指纹记录不会再命中
+            with self._lock:
+                removed = self._conn.execute("DELETE FROM file_fingerprints WHERE path=?", (key,)).rowcount
+                self._fingerprint_count -= removed
+                self._conn.commit()
+            raise
+        fingerprint = (st.st_size, st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, content_hash FROM file_fingerprints WHERE path=?",
+                (key,),
+            ).fetchone()
+        if row is not None and tuple(row[:3]) == fingerprint:
+            return row[3]
+        
+        # 指纹未知或已变化：完整计算内容哈希（不持有锁，允许多个线程并行计算）
+        content_hash = hash_file_content(key)
+        with self._lock:
+            # INSERT OR REPLACE 会删除同一路径的旧记录再插入，rowid 因此按写入先后递增
+            existed = self._conn.execute("SELECT 1 FROM file_fingerprints WHERE path=?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_fingerprints (path, size, mtime_ns, inode, content_hash)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, *fingerprint, content_hash),
+            )
+            if existed is None:
+                self._fingerprint_count += 1
+                if self._fingerprint_count > self.max_fingerprints:
+                    self._evict_fingerprints()
+            self._conn.commit()
+        return content_hash
+    
+    def get(self, content_hash: str) -> Optional[OCRPage]:
+        """查询缓存，未命中返回 None（命中空的 OCRPage 表示该图片无文字）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, page FROM ocr_results WHERE content_hash=? AND config_key=?",
+                (content_hash, self.config_key),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE ocr_results SET last_used=? WHERE content_hash=? AND config_key=?",
+                (time.time(), content_hash, self.config_key),
+            )
+            self._conn.commit()
+        return OCRPage.from_packed(row[0], row[1])
+    
+    def put(self, content_hash: str, page: OCRPage):
+        """写入一条识别结果，必要时触发淘汰"""
+        layout = page.pack_layout()
+        size = len(content_hash) + len(page.text.encode("utf-8")) + len(layout)
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM ocr_results WHERE content_hash=? AND config_key=?",
+                (content_hash, self.config_key),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (content_hash, config_key, text, page, size, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, self.config_key, page.text, layout, size, time.time()),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小降到上限的 90% 以下（调用方持有锁）"""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT rowid, size FROM ocr_results ORDER BY last_used ASC"
+        )
+        doomed = []
+        for rowid, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM ocr_results WHERE rowid=?", doomed)
+        print(f"[OCR缓存] 超出容量上限，已淘汰 {len(doomed)} 条旧记录")
+    
+    def _evict_fingerprints(self):
+        """按写入先后淘汰最早的文件指纹，直到记录数降到上限的 90% 以下（调用方持有锁）"""
+        excess = self._fingerprint_count - int(self.max_fingerprints * 0.9)
+        removed = self._conn.execute(
+            "DELETE FROM file_fingerprints WHERE rowid IN"
+            " (SELECT rowid FROM file_fingerprints ORDER BY rowid ASC LIMIT ?)",
+            (excess,),
+        ).rowcount
+        self._fingerprint_count -= removed
+        print(f"[OCR缓存] 文件指纹超出数量上限，已淘汰 {removed} 条旧记录")
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ========== 图片收集 ==========
+
+# 参与识别的图片扩展名（HEIC / HEIF 需要 pillow-heif 插件，解码后经预处理阶段转换为 PNG）
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp', '.avif'}
+if HEIF_AVAILABLE:
+    IMAGE_EXTENSIONS |= {'.heic', '.heif'}
+
+
+def scan_image_folder(folder_path: str) -> List[str]:
+    """递归扫描文件夹中的图片文件（按路径排序）"""
+    image_files = []
+    
+    if not os.path.exists(folder_path):
+        return image_files
+    
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            if Path(file).suffix.lower() in IMAGE_EXTENSIONS:
+                image_files.append(os.path.join(root, file))
+    
+    return sorted(image_files)
+
+
+def filter_image_files(file_paths: List[str]) -> List[str]:
+    """过滤出图片文件；其中的文件夹会被递归扫描"""
+    image_files = []
+    
+    for file_path in file_paths:
+        if os.path.isfile(file_path):
+            if Path(file_path).suffix.lower() in IMAGE_EXTENSIONS:
+                image_files.append(file_path)
+        elif os.path.isdir(file_path):
+            image_files.extend(scan_image_folder(file_path))
+    
+    return sorted(image_files)
+
+
+def find_paddleocr_exe() -> Optional[str]:
+    """查找 PaddleOCR-json.exe 的位置（兼容开发环境与打包后的 EXE），找不到或缺少 models 目录时返回 None"""
+    possible_paths = [
+        # 推荐结构：exe / main.py 同级的 PaddleOCR-json_v1.4.1 目录
+        resource_path(os.path.join("PaddleOCR-json_v1.4.1", "PaddleOCR-json.exe")),
+        # 兜底：直接放在根目录下
+        resource_path("PaddleOCR-json.exe"),
+    ]
+    
+    for path in possible_paths:
+        abs_path = os.path.abspath(path)
+        if os.path.exists(abs_path):
+            exe_dir = os.path.dirname(abs_path)
+            models_dir = os.path.join(exe_dir, "models")
+            if os.path.exists(models_dir):
+                return abs_path
+    
+    return None
+
+
+# ========== 流式识别 ==========
+
+class OCRResult:
+    """iter_ocr 逐张产出的识别结果；识别失败时 page 为空、error 为异常"""
+    __slots__ = ("path", "page", "cached", "error")
+    
+    def __init__(self, path: str, page: OCRPage, cached: bool = False, error: Optional[Exception] = None):
+        self.path = path
+        self.page = page
+        self.cached = cached
+        self.error = error
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+    
+    def __repr__(self):
+        state = "缓存" if self.cached else ("失败" if self.error else "完成")
+        return f"OCRResult({os.path.basename(self.path)}, {state}, {self.page!r})"
+
+
+def result_cache_key(content_hash: str, roi: Optional[ROITemplate] = None) -> str:
+    """持久化缓存的键：同一张图片在不同识别区域下的结果分别缓存"""
+    return f"{content_hash}#{roi.key()}" if roi else content_hash
+
+
+def iter_ocr(
+    pool: OCREnginePool,
+    paths: Iterable[str],
+    result_cache: Optional[OCRResultCache] = None,
+    roi: Optional[ROITemplate] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Iterator[OCRResult]:
+    """
+    流式识别一组图片，逐张产出 OCRResult。
+    
+    先查持久化缓存（哈希在线程池中并行计算，命中的图片立即产出、完全不经过引擎），
+    未命中的立即提交到引擎池；查缓存的同时就产出已经识别完成的图片，不必等全部文件哈希完，
+    结果按完成顺序产出并写回缓存。
+    调用方提前结束迭代（break / close）或 should_stop() 返回 True 时，尚未开始的任务会被取消。
+    """
+    paths = list(paths)
+    futures: Dict[Future, Tuple[str, Optional[str]]] = {}
+    # 已完成的引擎任务由回调放入队列，取结果时不必反复扫描全部未完成的 Future
+    finished: "queue.Queue[Future]" = queue.Queue()
+    hash_pool = None
+    
+    def lookup(img_path: str) -> Tuple[Optional[str], Optional[OCRPage]]:
+        try:
+            content_hash = result_cache.content_hash(img_path)
+            return content_hash, result_cache.get(result_cache_key(content_hash, roi))
+        except Exception as e:
+            print(f"[OCR缓存] 读取失败 {os.path.basename(img_path)}: {e}")
+            return None, None
+    
+    def to_result(future: Future) -> OCRResult:
+        img_path, content_hash = futures[future]
+        try:
+            page = OCRPage.from_lines(future.result())
+        except Exception as e:
+            return OCRResult(img_path, OCRPage(), error=e)
+        # 预处理失败、改由引擎读取原文件得到的结果与当前配置不符，不写入缓存
+        if result_cache is not None and content_hash is not None and not getattr(future, "fallback", False):
+            try:
+                result_cache.put(result_cache_key(content_hash, roi), page)
+            except Exception as e:
+                print(f"[OCR缓存] 写入失败 {os.path.basename(img_path)}: {e}")
+        return OCRResult(img_path, page)
+    
+    try:
+        if result_cache is not None:
+            # 按原顺序逐个取回哈希；前面的图片可以边查边送入引擎
+            hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="ocr-hash")
+            lookups = hash_pool.map(lookup, paths)
+        else:
+            lookups = ((None, None) for _ in paths)
+        
+        done = 0
+        for img_path, (content_hash, page) in zip(paths, lookups):
+            if should_stop is not None and should_stop():
+                return
+            if page is not None:
+                yield OCRResult(img_path, page, cached=True)
+            else:
+                future = pool.submit(img_path, content_hash, roi)
+                futures[future] = (img_path, content_hash)
+                future.add_done_callback(finished.put)
+            # 不等待：只取出此刻已经识别完成的图片
+            while True:
+                try:
+                    future = finished.get_nowait()
+                except queue.Empty:
+                    break
+                done += 1
+                yield to_result(future)
+        
+        while done < len(futures):
+            if should_stop is not None and should_stop():
+                return
+            # 带超时等待，以便及时响应 should_stop
+            try:
+                future = finished.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            done += 1
+            yield to_result(future)
+    finally:
+        if hash_pool is not None:
+            hash_pool.shutdown(wait=False, cancel_futures=True)
+        # 已完成的 Future 调用 cancel 没有副作用
+        for future in futures:
+            future.cancel()
+
+
+# ========== 匹配与重命名 ==========
+
+_VARIANT_CONVERTER = None
+# 汉字、日文假名与全角标点旁边的空格：这些文字不以空格分词，OCR 的分行 / 分词位置又不稳定，
+# 这类空格没有意义。拉丁字母（含重音字母）、西里尔字母与韩文以空格分词，不在此列
+_CJK_CHARS = (
+    "\u3000-\u303f\u3040-\u30ff\u31f0-\u31ff\u3400-\u4dbf\u4e00-\u9fff"
+    "\uf900-\ufaff\uff00-\uffef\U00020000-\U0002fa1f"
+)
+_CJK_SPACE = re.compile(f"(?<=[{_CJK_CHARS}]) | (?=[{_CJK_CHARS}])")
+
+
+def _fold_variants(text: str) -> str:
+    """繁体 -> 简体；opencc 不可用时原样返回"""
+    global _VARIANT_CONVERTER, OPENCC_AVAILABLE
+    if not OPENCC_AVAILABLE:
+        return text
+    if _VARIANT_CONVERTER is None:
+        # opencc 与 opencc-python-reimplemented 的配置名写法不同
+        for config in ("t2s", "t2s.json"):
+            try:
+                _VARIANT_CONVERTER = opencc.OpenCC(config)
+                break
+            except Exception:
+                continue
+        else:
+            OPENCC_AVAILABLE = False
+            print("警告：opencc 无法加载繁简转换配置，已跳过繁简折叠", file=sys.stderr)
+            return text
+    return _VARIANT_CONVERTER.convert(text)
+
+
+def normalize_text(text: str, fold_variants: Optional[bool] = None) -> str:
+    """
+    匹配用的规范化文本：全角 / 半角统一（NFKC）、大小写统一、去掉标点、连续空白（含换行）压缩为一个空格，
+    汉字 / 日文假名旁边的空格直接去掉；fold_variants 为 True 时再把繁体字折叠为简体（None 表示按调用时的 TEXT_FOLD_VARIANTS）
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if TEXT_FOLD_VARIANTS if fold_variants is None else fold_variants:
+        text = _fold_variants(text)
+    text = "".join(" " if unicodedata.category(ch)[0] == "P" else ch for ch in text)
+    return _CJK_SPACE.sub("", " ".join(text.split()))
+
+
+class TextFingerprint:
+    """
+    一张图片匹配文本的指纹：规范化文本、长度、摘要（用于精确查找）与 n-gram 集合（用于候选索引）。
+    
+    识别完成后每张图片只计算一次，之后的相似度计算、候选生成与搜索都直接使用，不再逐对预处理。
+    keep_grams 为 False 时不保存 n-gram 集合（lsh 索引只登记固定个数的签名分段、搜索只用文本），
+    需要时临时计算，每张图片只占文本、长度与摘要的内存。
+    """
+    
+    __slots__ = ("text", "length", "digest", "_grams")
+    
+    def __init__(self, text: str, keep_grams: bool = True):
+        self.text = text
+        self.length = len(text)
+        self.digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        self._grams = text_ngrams(text) if keep_grams else None
+    
+    @classmethod
+    def from_text(
+        cls, raw_text: str, fold_variants: Optional[bool] = None, keep_grams: bool = True,
+    ) -> "TextFingerprint":
+        return cls(normalize_text(raw_text, fold_variants), keep_grams)
+    
+    @property
+    def grams(self) -> set:
+        """n-gram 集合；没有保存时临时计算（不缓存）"""
+        return self._grams if self._grams is not None else text_ngrams(self.text)
+    
+    def __bool__(self) -> bool:
+        return bool(self.length)
+    
+    def __repr__(self):
+        return f"TextFingerprint({self.text[:20]!r}, length={self.length})"
+
+
+def fingerprint_similarity(a_print: TextFingerprint, b_print: TextFingerprint) -> float:
+    """两个指纹的相似度（0~1）：优先使用 fuzzywuzzy，否则使用 difflib"""
+    if FUZZYWUZZY_AVAILABLE:
+        return fuzz.ratio(a_print.text, b_print.text) / 100.0
+    return difflib.SequenceMatcher(None, a_print.text, b_print.text).ratio()
+
+
+# fuzz.ratio 把分数四舍五入到整数百分比，实际结果可能比理论上界高出半个百分点
+_SCORE_ROUNDING = 0.005 if FUZZYWUZZY_AVAILABLE else 0.0
+
+
+def length_bound(a_length: int, b_length: int) -> float:
+    """相似度的理论上界 2·min(la, lb) / (la + lb)：两段文本长度相差越大，相似度越不可能高"""
+    total = a_length + b_length
+    return 2.0 * min(a_length, b_length) / total if total else 1.0
+
+
+def length_window(length: int, threshold: float) -> Tuple[int, float]:
+    """与长度为 length 的文本比较时，相似度有可能达到 threshold 的对方长度范围 [下限, 上限]"""
+    threshold -= _SCORE_ROUNDING
+    if threshold <= 0:
+        return 0, math.inf
+    low = length * threshold / (2.0 - threshold)
+    high = length * (2.0 - threshold) / threshold
+    # 留一点浮点误差的余量，边界上的长度不会被误剪
+    return math.ceil(low - 1e-9), math.floor(high + 1e-9)
+
+
+def text_similarity(a_text: str, b_text: str) -> float:
+    """两段原始文本的相似度（0~1），先规范化（见 normalize_text）；批量比较请使用 MatchIndex 或 fingerprint_similarity"""
+    return fingerprint_similarity(TextFingerprint.from_text(a_text), TextFingerprint.from_text(b_text))
+
+
+class MatchKeyRule:
+    """
+    匹配键提取规则：从识别结果中取出能唯一标识页面的一小段文字（页码、题号、章节编号等）。支持的写法：
+    - "regex:第\\d+页"：按阅读顺序第一行匹配该正则的内容（有捕获组时取第一个捕获组）
+    - "line:0"：第 N 行的全部文字（从 0 开始，负数从末尾数起）
+    - "rect:0,0.9,1,1"：文本框中心落在该相对区域（同 ROITemplate）内的各行，可再加 ":正则" 从中提取
+    
+    置信度低于 MATCH_MIN_SCORE 的行不参与；提取结果经 normalize_text 规范化，为空时视为没有匹配键。
+    """
+    
+    def __init__(self, kind: str, pattern: Optional[str] = None, line: int = 0, region: Optional[ROITemplate] = None):
+        self.kind = kind
+        self.line = line
+        self.region = region
+        try:
+            self.pattern = re.compile(pattern) if pattern else None
+        except re.error as e:
+            raise ValueError(f"匹配键正则表达式无效: {pattern}（{e}）")
+    
+    @classmethod
+    def parse(cls, spec: str) -> "MatchKeyRule":
+        kind, _, value = (spec or "").strip().partition(":")
+        kind = kind.lower()
+        if kind == "regex" and value:
+            return cls("regex", pattern=value)
+        if kind == "line":
+            try:
+                return cls("line", line=int(value))
+            except ValueError:
+                raise ValueError(f"匹配键规则格式错误: {spec}")
+        if kind == "rect":
+            coords, _, pattern = value.partition(":")
+            return cls("rect", pattern=pattern or None, region=ROITemplate.parse(f"rect:{coords}"))
+        raise ValueError(f"无法识别的匹配键规则: {spec}")
+    
+    def _search(self, text: str) -> Optional[str]:
+        if self.pattern is None:
+            return text
+        found = self.pattern.search(text)
+        if found is None:
+            return None
+        return found.group(1) if found.re.groups else found.group(0)
+    
+    def extract(self, page: OCRPage, size: Tuple[int, int] = (0, 0)) -> Optional[str]:
+        """从一张图片的识别结果中提取匹配键；size 为图片的 (宽, 高)，rect 规则需要"""
+        rows = [i for i in range(len(page)) if page.score(i) >= MATCH_MIN_SCORE and page.line_text(i).strip()]
+        value = None
+        if self.kind == "regex":
+            value = next((found for found in map(self._search, (page.line_text(i) for i in rows)) if found), None)
+        elif self.kind == "line":
+            if -len(rows) <= self.line < len(rows):
+                value = page.line_text(rows[self.line])
+        elif self.kind == "rect":
+            width, height = size
+            if not width or not height:
+                return None
+            inside = []
+            for i in rows:
+                box = page.box(i)
+                if not box:
+                    continue
+                x = sum(point[0] for point in box) / len(box) / width
+                y = sum(point[1] for point in box) / len(box) / height
+                if self.region.left <= x <= self.region.right and self.region.top <= y <= self.region.bottom:
+                    inside.append(page.line_text(i))
+            if inside:
+                value = self._search("\n".join(inside))
+        if not value:
+            return None
+        return normalize_text(value) or None
+    
+    def __repr__(self):
+        if self.kind == "line":
+            return f"MatchKeyRule(line:{self.line})"
+        if self.kind == "rect":
+            return f"MatchKeyRule({self.region.key()}{':' + self.pattern.pattern if self.pattern else ''})"
+        return f"MatchKeyRule(regex:{self.pattern.pattern})"
+
+
+def parse_key_rules(specs: Iterable[str]) -> List[MatchKeyRule]:
+    """解析多条匹配键规则，按顺序尝试；空白项忽略"""
+    return [MatchKeyRule.parse(spec) for spec in specs if spec and spec.strip()]
+
+
+def extract_match_key(page: Optional[OCRPage], rules: List[MatchKeyRule], size: Tuple[int, int] = (0, 0)) -> Optional[str]:
+    """按顺序尝试各条规则，返回第一个提取到的匹配键（带规则序号，不同规则的键不会互相匹配）；都没有时返回 None"""
+    if page is None:
+        return None
+    for i, rule in enumerate(rules):
+        value = rule.extract(page, size)
+        if value:
+            return f"{i}:{value}"
+    return None
+
+
+def text_ngrams(text: str, n: int = NGRAM_SIZE) -> set:
+    """文本的字符 n-gram 集合（去掉空白并转小写）；不足 n 个字符时整段作为一个 n-gram"""
+    compact = "".join(text.split()).lower()
+    if len(compact) <= n:
+        return {compact} if compact else set()
+    return {compact[i:i + n] for i in range(len(compact) - n + 1)}
+
+
+_MINHASH_PARAMS: Dict[int, tuple] = {}
+
+
+def _minhash_params(num_perm: int) -> Tuple[List[int], List[int]]:
+    """MinHash 使用的 num_perm 组乘移哈希参数 (a 为奇数, b)，固定种子保证跨进程、跨会话一致"""
+    params = _MINHASH_PARAMS.get(num_perm)
+    if params is None:
+        rng = random.Random(MINHASH_SEED)
+        a = [rng.getrandbits(64) | 1 for _ in range(num_perm)]
+        b = [rng.getrandbits(64) for _ in range(num_perm)]
+        params = (a, b) if not NUMPY_AVAILABLE else (np.array(a, dtype=np.uint64), np.array(b, dtype=np.uint64))
+        _MINHASH_PARAMS[num_perm] = params
+    return params
+
+
+def minhash_signature(grams: Iterable[str], num_perm: int = MINHASH_PERMUTATIONS) -> array:
+    """
+    n-gram 集合的 MinHash 签名（num_perm 个 32 位无符号整数）。
+    每个 n-gram 先用 crc32 映射为 32 位整数 x，第 i 个哈希为 ((a_i * x + b_i) mod 2^64) >> 32，取各哈希的最小值。
+    两段文本签名中相同位置取值相同的比例，即为它们 n-gram 集合 Jaccard 相似度的估计。
+    """
+    hashes = [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+    if not hashes:
+        return array("I", [0xFFFFFFFF] * num_perm)
+    a, b = _minhash_params(num_perm)
+    if NUMPY_AVAILABLE:
+        x = np.array(hashes, dtype=np.uint64)
+        # uint64 乘法按 2^64 取模回绕，正是乘移哈希需要的行为
+        values = (np.outer(x, a) + b) >> np.uint64(32)
+        return array("I", values.min(axis=0).astype(np.uint32).tobytes())
+    mask = 0xFFFFFFFFFFFFFFFF
+    return array("I", [min(((a_i * x + b_i) & mask) >> 32 for x in hashes) for a_i, b_i in zip(a, b)])
+
+
+def lsh_band_keys(signature: array, bands: int = LSH_BANDS) -> List[int]:
+    """
+    把 MinHash 签名切成 bands 段，每段的取值连同段号一起哈希为一个整数键；两段文本有任一段相同即成为候选。
+    用 blake2b 而不是内置 hash()（字符串 / 字节的 hash 每个进程加盐不同），同一段签名在任何进程里得到的键都相同。
+    """
+    rows = len(signature) // bands
+    raw = signature.tobytes()
+    width = rows * signature.itemsize
+    return [
+        int.from_bytes(
+            hashlib.blake2b(raw[band * width:(band + 1) * width], digest_size=8, salt=band.to_bytes(8, "little")).digest(),
+            "little",
+        )
+        for band in range(bands)
+    ]
+
+
+def lsh_candidate_probability(jaccard: float, bands: int = LSH_BANDS, num_perm: int = MINHASH_PERMUTATIONS) -> float:
+    """n-gram Jaccard 相似度为 jaccard 的两段文本至少有一段 LSH 键相同（成为候选）的概率：1 - (1 - s^r)^b"""
+    rows = num_perm // bands
+    return 1.0 - (1.0 - jaccard ** rows) ** bands
+
+
+def choose_index_mode(a_count: int) -> str:
+    """按 MATCH_INDEX_MODE 与 A 组规模选择候选索引模式"""
+    if MATCH_INDEX_MODE != "auto":
+        return MATCH_INDEX_MODE
+    return "lsh" if a_count >= LSH_AUTO_MIN_SIZE else "ngram"
+
+
+def sizes_compatible(a_size: Tuple[int, int], b_size: Tuple[int, int], tolerance: float = SIZE_TOLERANCE) -> bool:
+    """
+    尺寸限制：两张图片尺寸都已知时必须相同（宽、高的相对差不超过 tolerance），任一未知（0）则不限制
+    """
+    a_width, a_height = a_size
+    b_width, b_height = b_size
+    if a_width and a_height and b_width and b_height:
+        if tolerance <= 0:
+            return a_width == b_width and a_height == b_height
+        return (abs(a_width - b_width) <= tolerance * max(a_width, b_width)
+                and abs(a_height - b_height) <= tolerance * max(a_height, b_height))
+    return True
+
+
+UNKNOWN_SIZE = (0, 0)
+
+
+def size_bucket(size: Tuple[int, int]) -> Tuple[int, int]:
+    """尺寸分桶的键：宽、高都已知时为 (宽, 高)，否则归入未知尺寸桶"""
+    width, height = size
+    return (width, height) if width and height else UNKNOWN_SIZE
+
+
+class MatchIndex:
+    """
+    A 组匹配索引：登记 A 组图片的匹配文本与尺寸，为 B 组文本查找相似度最高、
+    不低于阈值且尚未被占用的 A 组图片。
+    
+    占用关系保存在索引中（一对一匹配），同一个索引可以跨多批 B 组结果持续使用。
+    size_limit 为 True 时只在尺寸相同的图片之间匹配（见 sizes_compatible，容差为 size_tolerance）。
+    A 组图片按尺寸分桶登记，每个桶有自己的候选索引，尺寸限制下只在兼容的桶里生成候选。
+    
+    revision 在候选集合可能变多时递增（登记新图片、释放占用、放宽条件）：
+    调用方记下某张 B 组图片“没有匹配”时的 revision，revision 未变就无需重新比较。
+    
+    A 组图片超过 top_k 张时，先用候选索引选出 top_k 个候选，只对它们计算精确相似度；
+    top_k 为 0 / None 时逐一比较全部 A 组图片。候选索引有两种（mode）：
+    
+    - "ngram"：字符 n-gram 倒排索引，按共享 n-gram 的数量排序；
+    - "lsh"：MinHash 签名分段后的 LSH 键，按相同分段的数量排序，每张图片只登记 bands 个键。
+    
+    登记与查询的文本在索引内部各计算一次指纹（TextFingerprint），相似度与候选索引键都基于规范化文本，
+    比较时不再逐对预处理。规范化文本完全相同的图片通过摘要直接查到（exact_match），登记了匹配键（见 MatchKeyRule）的
+    图片按键直接查到（key_match），都不经过候选生成与相似度计算。
+    
+    相似度与候选列表都会缓存（B 组文本即行键，重命名不影响）：阈值、占用关系变化后重新分配只需查表，
+    尺寸限制切换过一次后两种状态的候选列表都已缓存；登记 / 移除 A 组图片只丢弃该图片所在的列，
+    以及包含该图片或查询过它的索引键的候选列表（已算过的相似度仍然复用）。
+    候选列表按排名缓存前 top_k × CANDIDATE_ROW_SLACK 名，查询时从中取前 top_k 个未被占用的图片。
+    
+    相似度不超过 2·min(la, lb) / (la + lb)（见 length_bound）：每个桶按规范化文本长度排序，
+    逐一比较时只扫描可能达到阈值的长度区间，候选列表中长度不可能达标的图片也直接跳过（计入 length_pruned）；
+    best_match 按上界从高到低比较，上界低于当前最佳时提前结束。
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.80,
+        size_limit: bool = True,
+        top_k: Optional[int] = MATCH_TOP_K,
+        mode: str = "ngram",
+        num_perm: int = MINHASH_PERMUTATIONS,
+        bands: int = LSH_BANDS,
+        size_tolerance: float = SIZE_TOLERANCE,
+    ):
+        if mode not in ("ngram", "lsh"):
+            raise ValueError(f"未知的候选索引模式: {mode}")
+        if mode == "lsh" and (bands <= 0 or num_perm % bands):
+            raise ValueError(f"MinHash 签名长度 {num_perm} 必须能被 LSH 分段数 {bands} 整除")
+        self.threshold = threshold
+        self.size_limit = size_limit
+        self.top_k = top_k
+        self.mode = mode
+        self.num_perm = num_perm
+        self.bands = bands
+        self.size_tolerance = size_tolerance
+        # 按登记顺序保存：相似度相同时先登记的优先
+        self._texts: Dict[str, str] = {}
+        self._prints: Dict[str, TextFingerprint] = {}
+        self._sizes: Dict[str, Tuple[int, int]] = {}
+        self._order: Dict[str, int] = {}
+        self._seq = 0
+        # 按尺寸分桶：尺寸 -> 桶内的 A 组图片，以及桶内的候选索引（n-gram 或 LSH 分段键 -> 登记了该键的 A 组图片）
+        self._grams: Dict[str, Iterable] = {}
+        self._bucket_members: Dict[Tuple[int, int], set] = {}
+        self._bucket_postings: Dict[Tuple[int, int], Dict[object, set]] = {}
+        # 各桶按规范化文本长度排序的 (长度列表, 路径列表)，桶内图片变化时丢弃、使用时重建
+        self._length_sorted: Dict[Tuple[int, int], Tuple[List[int], List[str]]] = {}
+        # 精确查找：规范化文本的摘要 / 匹配键 -> A 组图片
+        self._by_digest: Dict[bytes, set] = {}
+        self._keys: Dict[str, str] = {}
+        self._by_key: Dict[str, set] = {}
+        # 相似度缓存（稀疏矩阵）：B 组文本 -> {A组路径: 相似度}，以及 A组路径 -> 缓存了它的行
+        self._scores: Dict[str, Dict[str, float]] = {}
+        self._score_rows: Dict[str, set] = {}
+        # B 组文本 -> 指纹（与相似度缓存的行同时丢弃）
+        self._b_prints: Dict[str, TextFingerprint] = {}
+        # 候选列表缓存：(B 组文本, 尺寸限制下的 B 组尺寸) -> (按排名排列的 A 组路径, 是否完整, 查询过的索引键)，
+        # 不考虑占用；None 表示逐一比较（查询时按长度区间扫描）。另记录每张 A 组图片 / 每个索引键涉及的行，
+        # A 组变化时只丢弃受影响的行
+        self._candidate_rows: Dict[tuple, Optional[tuple]] = {}
+        self._rows_by_a: Dict[str, set] = {}
+        self._rows_by_key: Dict[object, set] = {}
+        self._full_rows: set = set()
+        self.claimed: set = set()
+        self.revision = 0
+        # 相似度缓存命中 / 实际计算的次数，以及通过摘要 / 匹配键直接匹配的次数
+        self.score_hits = 0
+        self.score_misses = 0
+        self.exact_hits = 0
+        self.key_hits = 0
+        # 因长度上界达不到阈值（或不可能超过当前最佳）而跳过的比较次数
+        self.length_pruned = 0
+    
+    def index_keys(self, text_print: TextFingerprint) -> Iterable:
+        """指纹在候选索引中的键：n-gram 集合，或 MinHash 签名的 LSH 分段键"""
+        if self.mode == "lsh":
+            return lsh_band_keys(minhash_signature(text_print.grams, self.num_perm), self.bands)
+        return text_print.grams
+    
+    def fingerprint(self, b_text: str) -> TextFingerprint:
+        """B 组文本的指纹（每段文本只计算一次）"""
+        text_print = self._b_prints.get(b_text)
+        if text_print is None:
+            text_print = self._b_prints[b_text] = TextFingerprint.from_text(b_text, keep_grams=self.mode == "ngram")
+        return text_print
+    
+    def add(self, a_path: str, text: str, size: Tuple[int, int] = (0, 0), key: Optional[str] = None):
+        """登记（或更新）一张 A 组图片及其匹配键（见 extract_match_key）；没有文字（规范化后为空）的图片不参与匹配"""
+        if a_path in self._texts and self._texts[a_path] == text:
+            if self._sizes[a_path] != size or self._keys.get(a_path) != key:
+                self._register(a_path, text, self._prints[a_path], size, key)
+            return
+        text_print = TextFingerprint.from_text(text, keep_grams=self.mode == "ngram") if text else None
+        if not text_print:
+            self.discard(a_path)
+            return
+        self._drop_column(a_path)
+        self._register(a_path, text, text_print, size, key)
+    
+    def _register(self, a_path: str, text: str, text_print: TextFingerprint, size: Tuple[int, int], key: Optional[str]):
+        self._unindex(a_path)
+        if a_path not in self._order:
+            self._order[a_path] = self._seq
+            self._seq += 1
+        self._texts[a_path] = text
+        self._prints[a_path] = text_print
+        self._sizes[a_path] = size
+        self._by_digest.setdefault(text_print.digest, set()).add(a_path)
+        if key:
+            self._keys[a_path] = key
+            self._by_key.setdefault(key, set()).add(a_path)
+        grams = self.index_keys(text_print)
+        self._grams[a_path] = grams
+        # 新图片可能进入查询过相同索引键的候选列表；逐一比较的行可能因 A 组变大而改为按索引排序
+        for row_key in list(self._full_rows):
+            self._drop_row(row_key)
+        for gram in grams:
+            for row_key in list(self._rows_by_key.get(gram, ())):
+                self._drop_row(row_key)
+        bucket = size_bucket(size)
+        self._bucket_members.setdefault(bucket, set()).add(a_path)
+        self._length_sorted.pop(bucket, None)
+        postings = self._bucket_postings.setdefault(bucket, {})
+        for gram in grams:
+            entry = postings.get(gram)
+            if entry is None:
+                postings[gram] = {a_path}
+            else:
+                entry.add(a_path)
+        self.revision += 1
+    
+    def discard(self, a_path: str):
+        self._drop_column(a_path)
+        self._unindex(a_path)
+        self._texts.pop(a_path, None)
+        self._prints.pop(a_path, None)
+        self._sizes.pop(a_path, None)
+        self._order.pop(a_path, None)
+        self.claimed.discard(a_path)
+    
+    def move(self, old_path: str, new_path: str):
+        """图片被重命名：改用新路径登记，保留登记顺序与占用状态"""
+        if old_path not in self._texts or old_path == new_path:
+            return
+        order = self._order[old_path]
+        claimed = old_path in self.claimed
+        text, text_print, size = self._texts[old_path], self._prints[old_path], self._sizes[old_path]
+        key = self._keys.get(old_path)
+        column = {row_key: self._scores[row_key][old_path] for row_key in self._score_rows.get(old_path, ())}
+        self.discard(old_path)
+        self.discard(new_path)
+        self._register(new_path, text, text_print, size, key)
+        self._order[new_path] = order
+        if claimed:
+            self.claimed.add(new_path)
+        # 文本没变，已算过的相似度随路径迁移
+        for row_key, similarity in column.items():
+            self._scores.setdefault(row_key, {})[new_path] = similarity
+        if column:
+            self._score_rows[new_path] = set(column)
+    
+    def forget(self, b_text: str):
+        """丢弃一段 B 组文本的缓存行（B 组图片被移除或重新识别时调用）"""
+        self._b_prints.pop(b_text, None)
+        for a_path in self._scores.pop(b_text, {}):
+            rows = self._score_rows.get(a_path)
+            if rows is not None:
+                rows.discard(b_text)
+        for key in [key for key in self._candidate_rows if key[0] == b_text]:
+            self._drop_row(key)
+    
+    def _drop_row(self, row_key: tuple):
+        row = self._candidate_rows.pop(row_key, None)
+        self._full_rows.discard(row_key)
+        if row is None:
+            return
+        ranked, _complete, queried = row
+        for a_path in ranked:
+            rows = self._rows_by_a.get(a_path)
+            if rows is not None:
+                rows.discard(row_key)
+                if not rows:
+                    del self._rows_by_a[a_path]
+        for key in queried:
+            rows = self._rows_by_key.get(key)
+            if rows is not None:
+                rows.discard(row_key)
+                if not rows:
+                    del self._rows_by_key[key]
+    
+    def _drop_column(self, a_path: str):
+        for row_key in self._score_rows.pop(a_path, ()):
+            row = self._scores.get(row_key)
+            if row is not None:
+                row.pop(a_path, None)
+    
+    def _unindex(self, a_path: str):
+        grams = self._grams.pop(a_path, None)
+        if grams is None:
+            return
+        for row_key in list(self._rows_by_a.get(a_path, ())):
+            self._drop_row(row_key)
+        digest = self._prints[a_path].digest
+        same_text = self._by_digest[digest]
+        same_text.discard(a_path)
+        if not same_text:
+            del self._by_digest[digest]
+        key = self._keys.pop(a_path, None)
+        if key is not None:
+            same_key = self._by_key[key]
+            same_key.discard(a_path)
+            if not same_key:
+                del self._by_key[key]
+        bucket = size_bucket(self._sizes[a_path])
+        bucket_postings = self._bucket_postings[bucket]
+        for gram in grams:
+            postings = bucket_postings.get(gram)
+            if postings is not None:
+                postings.discard(a_path)
+                if not postings:
+                    del bucket_postings[gram]
+        self._length_sorted.pop(bucket, None)
+        members = self._bucket_members[bucket]
+        members.discard(a_path)
+        if self.top_k and len(members) <= self.top_k:
+            self._drop_ranked_rows(bucket)
+        if not members:
+            del self._bucket_members[bucket]
+            del self._bucket_postings[bucket]
+    
+    def _drop_ranked_rows(self, bucket: Tuple[int, int]):
+        """
+        丢弃与该桶兼容的 B 组图片按排名缓存的候选列表：桶缩小到 top_k 张以内后，
+        兼容桶的总数可能不再超过 top_k，这些 B 组图片应改为逐一比较（逐一比较的行不受影响）
+        """
+        for row_key, row in list(self._candidate_rows.items()):
+            if row is not None and (row_key[1] is None or sizes_compatible(bucket, row_key[1], self.size_tolerance)):
+                self._drop_row(row_key)
+    
+    def claim(self, a_path: str):
+        """标记 A 组图片已被匹配，之后不再作为候选"""
+        self.claimed.add(a_path)
+    
+    def release(self, a_path: str):
+        if a_path in self.claimed:
+            self.claimed.discard(a_path)
+            self.revision += 1
+    
+    def set_criteria(self, threshold: float, size_limit: bool):
+        """修改阈值 / 尺寸限制；条件放宽时之前没有匹配的 B 组图片需要重新比较"""
+        if threshold < self.threshold or (self.size_limit and not size_limit):
+            self.revision += 1
+        self.threshold = threshold
+        self.size_limit = size_limit
+    
+    def text(self, a_path: str) -> str:
+        return self._texts.get(a_path, "")
+    
+    def __len__(self) -> int:
+        return len(self._texts)
+    
+    def __contains__(self, a_path: str) -> bool:
+        return a_path in self._texts
+    
+    def _compatible_buckets(self, b_size: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """与该 B 组图片尺寸兼容的桶（未知尺寸的桶总是兼容）；不限制尺寸或 B 组尺寸未知时为全部桶"""
+        b_bucket = size_bucket(b_size)
+        if not self.size_limit or b_bucket == UNKNOWN_SIZE:
+            return list(self._bucket_members)
+        if self.size_tolerance <= 0:
+            return [bucket for bucket in (b_bucket, UNKNOWN_SIZE) if bucket in self._bucket_members]
+        return [
+            bucket for bucket in self._bucket_members
+            if bucket == UNKNOWN_SIZE or sizes_compatible(bucket, b_bucket, self.size_tolerance)
+        ]
+    
+    def _first_available(self, a_paths: Optional[set], b_size: Tuple[int, int]) -> Optional[str]:
+        """a_paths 中尺寸兼容且未被占用、登记最早的 A 组图片"""
+        if not a_paths:
+            return None
+        check_size = self.size_limit and size_bucket(b_size) != UNKNOWN_SIZE
+        best = None
+        for a_path in a_paths:
+            if a_path in self.claimed:
+                continue
+            if check_size and not sizes_compatible(self._sizes[a_path], b_size, self.size_tolerance):
+                continue
+            if best is None or self._order[a_path] < self._order[best]:
+                best = a_path
+        return best
+    
+    def exact_match(self, b_text: str, b_size: Tuple[int, int] = (0, 0)) -> Optional[str]:
+        """规范化文本与 B 组文本完全相同、尺寸兼容且未被占用的 A 组图片（有多张时取先登记的），没有时返回 None"""
+        if not b_text:
+            return None
+        best = self._first_available(self._by_digest.get(self.fingerprint(b_text).digest), b_size)
+        if best is not None:
+            self.exact_hits += 1
+        return best
+    
+    def key_match(self, b_key: Optional[str], b_size: Tuple[int, int] = (0, 0)) -> Optional[str]:
+        """匹配键与 b_key 相同、尺寸兼容且未被占用的 A 组图片（有多张时取先登记的），没有时返回 None"""
+        if not b_key:
+            return None
+        best = self._first_available(self._by_key.get(b_key), b_size)
+        if best is not None:
+            self.key_hits += 1
+        return best
+    
+    def candidates(self, b_text: str, b_size: Tuple[int, int] = (0, 0)) -> Iterator[str]:
+        """
+        可以与该 B 组图片比较的 A 组图片：未被占用且尺寸兼容；
+        A 组较大时只给出未被占用的图片中与 B 组文本共享索引键（n-gram / LSH 分段）最多的 top_k 个，按登记顺序产出。
+        """
+        key = (b_text, tuple(b_size) if self.size_limit else None)
+        if key in self._candidate_rows:
+            row = self._candidate_rows[key]
+        else:
+            row = self._cache_row(key, b_text, b_size)
+        low, high = length_window(self.fingerprint(b_text).length, self.threshold)
+        if row is None:
+            for a_path in self._length_range(self._compatible_buckets(b_size), low, high):
+                if a_path not in self.claimed:
+                    yield a_path
+            return
+        ranked, complete, _queried = row
+        chosen, pruned = self._pick_unclaimed(ranked, low, high)
+        if len(chosen) < self.top_k and not complete:
+            # 缓存的排名被占用的图片用完了：按当前占用关系重新排序（不缓存，占用关系随时会变）
+            ranked, _complete, _queried = self._rank_candidates(
+                b_text, b_size, self.top_k * CANDIDATE_ROW_SLACK, exclude=self.claimed,
+            )
+            chosen, pruned = self._pick_unclaimed(ranked, low, high)
+        self.length_pruned += pruned
+        yield from sorted(chosen, key=self._order.__getitem__)
+    
+    def _pick_unclaimed(self, ranked: List[str], low: int, high: float) -> Tuple[List[str], int]:
+        """按排名取前 top_k 个未被占用且长度可能达到阈值的图片，返回 (图片列表, 因长度跳过的张数)"""
+        chosen = []
+        pruned = 0
+        for a_path in ranked:
+            if a_path in self.claimed:
+                continue
+            if not low <= self._prints[a_path].length <= high:
+                pruned += 1
+                continue
+            chosen.append(a_path)
+            if len(chosen) >= self.top_k:
+                break
+        return chosen, pruned
+    
+    def _cache_row(self, row_key: tuple, b_text: str, b_size: Tuple[int, int]) -> Optional[tuple]:
+        row = self._rank_candidates(b_text, b_size, (self.top_k or 0) * CANDIDATE_ROW_SLACK)
+        self._candidate_rows[row_key] = row
+        if row is None:
+            self._full_rows.add(row_key)
+            return None
+        ranked, _complete, queried = row
+        for a_path in ranked:
+            self._rows_by_a.setdefault(a_path, set()).add(row_key)
+        for key in queried:
+            self._rows_by_key.setdefault(key, set()).add(row_key)
+        return row
+    
+    def _length_range(self, buckets: List[Tuple[int, int]], low: int, high: float) -> List[str]:
+        """各桶中规范化文本长度在 [low, high] 内的 A 组图片（二分查找），按登记顺序排列"""
+        window = []
+        for bucket in buckets:
+            entry = self._length_sorted.get(bucket)
+            if entry is None:
+                members = sorted(self._bucket_members[bucket], key=lambda a_path: self._prints[a_path].length)
+                entry = self._length_sorted[bucket] = ([self._prints[a_path].length for a_path in members], members)
+            lengths, members = entry
+            start, stop = bisect.bisect_left(lengths, low), bisect.bisect_right(lengths, high)
+            self.length_pruned += len(members) - (stop - start)
+            window.extend(members[start:stop])
+        window.sort(key=self._order.__getitem__)
+        return window
+    
+    def _rank_candidates(
+        self, b_text: str, b_size: Tuple[int, int], limit: int, exclude: Optional[set] = None,
+    ) -> Optional[tuple]:
+        """
+        按共享索引键的数量（相同时按登记顺序）排出前 limit 个候选，返回 (A 组路径列表, 是否已包含全部候选, 查询过的索引键)；
+        逐一比较（A 组不超过 top_k 张或 top_k 为 0）时返回 None，由 candidates 按长度区间扫描。exclude 中的图片不参与排名。
+        """
+        buckets = self._compatible_buckets(b_size)
+        if not self.top_k or sum(len(self._bucket_members[bucket]) for bucket in buckets) <= self.top_k:
+            return None
+        
+        keys = set(self.index_keys(self.fingerprint(b_text)))
+        queried = [
+            (bucket_postings[key], key)
+            for bucket_postings in (self._bucket_postings[bucket] for bucket in buckets)
+            for key in keys if key in bucket_postings
+        ]
+        # A 组中还没有的键也记下：之后登记的图片带有这些键时，该行需要重新排序
+        #（n-gram 的罕见程度随 A 组变化而略有漂移时不重新选择查询的键，排名仍以选定的键为准）
+        unseen = keys.difference(key for _postings, key in queried)
+        if self.mode == "ngram":
+            queried = heapq.nsmallest(NGRAM_QUERY_LIMIT, queried, key=lambda item: len(item[0]))
+        shared: Counter = Counter()
+        for postings, _key in queried:
+            shared.update(postings)
+        if exclude:
+            for a_path in [a_path for a_path in shared if a_path in exclude]:
+                del shared[a_path]
+        ranked = heapq.nsmallest(limit, shared, key=lambda a_path: (-shared[a_path], self._order[a_path]))
+        return ranked, len(shared) <= limit, [key for _postings, key in queried] + list(unseen)
+    
+    def similarity(self, a_path: str, b_text: str) -> float:
+        """A 组图片与 B 组文本的相似度，优先取缓存"""
+        row = self._scores.get(b_text)
+        if row is not None:
+            similarity = row.get(a_path)
+            if similarity is not None:
+                self.score_hits += 1
+                return similarity
+        else:
+            row = self._scores[b_text] = {}
+        self.score_misses += 1
+        similarity = row[a_path] = fingerprint_similarity(self._prints[a_path], self.fingerprint(b_text))
+        self._score_rows.setdefault(a_path, set()).add(b_text)
+        return similarity
+    
+    def scored_candidates(self, b_text: str, b_size: Tuple[int, int] = (0, 0)) -> List[Tuple[str, float]]:
+        """相似度不低于阈值的全部候选 [(A组路径, 相似度), ...]，按登记顺序排列"""
+        if not b_text or not self.fingerprint(b_text):
+            return []
+        scored = []
+        for a_path in self.candidates(b_text, b_size):
+            similarity = self.similarity(a_path, b_text)
+            if similarity >= self.threshold:
+                scored.append((a_path, similarity))
+        return scored
+    
+    def best_match(
+        self, b_text: str, b_size: Tuple[int, int] = (0, 0), b_key: Optional[str] = None,
+    ) -> Optional[Tuple[str, float]]:
+        """
+        相似度最高且不低于阈值的候选，返回 (A组路径, 相似度)；没有时返回 None（不占用）。
+        先按匹配键查找（找到即配对，相似度只计算这一对用于显示），再按摘要查找规范化文本完全相同的图片
+        （相似度即为 1.0），都没有时才逐一比较候选。
+        """
+        a_path = self.key_match(b_key, b_size)
+        if a_path is not None:
+            return a_path, self.similarity(a_path, b_text)
+        a_path = self.exact_match(b_text, b_size)
+        if a_path is not None:
+            return a_path, 1.0
+        if not b_text or not self.fingerprint(b_text):
+            return None
+        # 按相似度上界从高到低比较：上界已低于当前最佳时，剩下的候选都不可能胜出
+        b_length = self.fingerprint(b_text).length
+        bounded = sorted(
+            ((length_bound(self._prints[a_path].length, b_length), a_path) for a_path in self.candidates(b_text, b_size)),
+            key=lambda item: (-item[0], self._order[item[1]]),
+        )
+        best = None
+        for i, (bound, a_path) in enumerate(bounded):
+            if best is not None and bound + _SCORE_ROUNDING < best[1]:
+                self.length_pruned += len(bounded) - i
+                break
+            similarity = self.similarity(a_path, b_text)
+            if similarity < self.threshold:
+                continue
+            if best is None or similarity > best[1] or (similarity == best[1] and self._order[a_path] < self._order[best[0]]):
+                best = (a_path, similarity)
+        return best
+
+
+def _b_item(item: tuple) -> Tuple[str, str, Tuple[int, int], Optional[str]]:
+    """b_stream 的一项：(B组路径, 匹配文本, 尺寸) 或带上匹配键的 (B组路径, 匹配文本, 尺寸, 匹配键)"""
+    return item if len(item) == 4 else (*item, None)
+
+
+def iter_matches(
+    a_index: MatchIndex,
+    b_stream: Iterable[tuple],
+) -> Iterator[Tuple[str, str, float]]:
+    """
+    流式匹配：b_stream 逐个给出 (B组路径, 匹配文本, 尺寸[, 匹配键])，每到一张就在 A 组索引中查找并占用最佳匹配，
+    产出 (B组路径, A组路径, 相似度)；没有达到阈值的 B 组图片不产出。
+    b_stream 可以直接接在 iter_ocr 之后，识别与匹配同时进行。
+    """
+    for item in b_stream:
+        b_path, b_text, b_size, b_key = _b_item(item)
+        best = a_index.best_match(b_text, b_size, b_key)
+        if best is None:
+            continue
+        a_path, similarity = best
+        a_index.claim(a_path)
+        yield b_path, a_path, similarity
+
+
+def candidate_edges(
+    a_index: MatchIndex,
+    b_stream: Iterable[tuple],
+) -> Iterator[Tuple[str, str, float]]:
+    """稀疏相似度矩阵：b_stream 逐个给出 (B组路径, 匹配文本, 尺寸[, 匹配键])，产出每个不低于阈值的候选 (B组路径, A组路径, 相似度)，不占用"""
+    for item in b_stream:
+        b_path, b_text, b_size, _b_key = _b_item(item)
+        for a_path, similarity in a_index.scored_candidates(b_text, b_size):
+            yield b_path, a_path, similarity
+
+
+def assign_global_greedy(edges: Iterable[Tuple[str, str, float]]) -> List[Tuple[str, str, float]]:
+    """全局贪心：所有候选按相似度从高到低出堆，两端都未被占用即确定配对（相似度相同时按路径排序，结果与输入顺序无关）"""
+    heap = [(-similarity, b_path, a_path) for b_path, a_path, similarity in edges]
+    heapq.heapify(heap)
+    used_b, used_a = set(), set()
+    matches = []
+    while heap:
+        neg_similarity, b_path, a_path = heapq.heappop(heap)
+        if b_path in used_b or a_path in used_a:
+            continue
+        used_b.add(b_path)
+        used_a.add(a_path)
+        matches.append((b_path, a_path, -neg_similarity))
+    return matches
+
+
+def _hungarian(cost: List[List[float]]) -> List[int]:
+    """
+    矩形代价矩阵（行数不超过列数）的最小代价分配，返回每行分到的列号。
+    经典的势函数实现，复杂度 O(行数^2 × 列数)；安装了 scipy 时改用 linear_sum_assignment。
+    """
+    n, m = len(cost), len(cost[0])
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    owner = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = row[j - 1] - u[i0] - v[j]
+                    if current < minv[j]:
+                        minv[j] = current
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    assignment = [-1] * n
+    for j in range(1, m + 1):
+        if owner[j]:
+            assignment[owner[j] - 1] = j - 1
+    return assignment
+
+
+def _solve_component(weights: Dict[Tuple[str, str], float]) -> List[Tuple[str, str, float]]:
+    """在一个连通分量内求总相似度最大的一对一匹配；行列按路径排序，结果与输入顺序无关"""
+    b_paths = sorted({b_path for b_path, _a_path in weights})
+    a_paths = sorted({a_path for _b_path, a_path in weights})
+    transposed = len(b_paths) > len(a_paths)
+    rows, cols = (a_paths, b_paths) if transposed else (b_paths, a_paths)
+    # 没有候选关系的位置权重为 0：分到这样的位置即表示该图片不匹配
+    matrix = [
+        [weights.get((col, row) if transposed else (row, col), 0.0) for col in cols]
+        for row in rows
+    ]
+    if SCIPY_AVAILABLE:
+        from scipy.optimize import linear_sum_assignment
+        row_ind, col_ind = linear_sum_assignment(np.array(matrix), maximize=True)
+        pairs = zip(row_ind.tolist(), col_ind.tolist())
+    else:
+        pairs = enumerate(_hungarian([[-w for w in row] for row in matrix]))
+    matches = []
+    for r, c in pairs:
+        b_path, a_path = (cols[c], rows[r]) if transposed else (rows[r], cols[c])
+        similarity = weights.get((b_path, a_path))
+        if similarity is not None:
+            matches.append((b_path, a_path, similarity))
+    return matches
+
+
+def assign_optimal(
+    edges: Iterable[Tuple[str, str, float]],
+    max_component: int = ASSIGNMENT_MAX_COMPONENT,
+) -> List[Tuple[str, str, float]]:
+    """
+    全局最优一对一匹配：候选 (B组路径, A组路径, 相似度) 构成稀疏二分图，按连通分量分别求总相似度最大的匹配。
+    候选经过 top-K 与阈值筛选后分量通常只有几张图片；较小一侧超过 max_component 张的分量改用全局贪心。
+    """
+    parent: Dict[tuple, tuple] = {}
+    
+    def find(node):
+        root = node
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+    
+    weights: Dict[Tuple[str, str], float] = {}
+    for b_path, a_path, similarity in edges:
+        weights[(b_path, a_path)] = similarity
+        root_b, root_a = find(("B", b_path)), find(("A", a_path))
+        if root_b != root_a:
+            parent[root_b] = root_a
+    
+    components: Dict[tuple, Dict[Tuple[str, str], float]] = {}
+    for (b_path, a_path), similarity in weights.items():
+        components.setdefault(find(("B", b_path)), {})[(b_path, a_path)] = similarity
+    
+    matches = []
+    for component in components.values():
+        if len(component) == 1:
+            (b_path, a_path), similarity = next(iter(component.items()))
+            matches.append((b_path, a_path, similarity))
+            continue
+        side = min(len({b for b, _a in component}), len({a for _b, a in component}))
+        if side > max_component:
+            matches.extend(assign_global_greedy((b, a, w) for (b, a), w in component.items()))
+        else:
+            matches.extend(_solve_component(component))
+    matches.sort(key=lambda match: match[0])
+    return matches
+
+
+def direct_match(a_index: MatchIndex, item: tuple) -> Optional[Tuple[str, str, float]]:
+    """
+    不经过相似度比较的配对：先按匹配键、再按规范化文本的摘要查找，找到时占用该 A 组图片并返回
+    (B组路径, A组路径, 相似度)（按键配对时只计算这一对的相似度，文本完全相同时为 1.0），否则返回 None
+    """
+    b_path, b_text, b_size, b_key = _b_item(item)
+    a_path = a_index.key_match(b_key, b_size)
+    if a_path is not None:
+        similarity = a_index.similarity(a_path, b_text)
+    else:
+        a_path = a_index.exact_match(b_text, b_size)
+        if a_path is None:
+            return None
+        similarity = 1.0
+    a_index.claim(a_path)
+    return b_path, a_path, similarity
+
+
+def assign_matches(
+    a_index: MatchIndex,
+    b_stream: Iterable[tuple],
+    method: str = MATCH_ASSIGNMENT,
+) -> List[Tuple[str, str, float]]:
+    """
+    按 method（见 MATCH_ASSIGNMENT）为 b_stream 中的图片分配 A 组图片，并在索引中占用已分配的 A 组图片。
+    匹配键相同或规范化文本完全相同的图片先直接配对（见 direct_match），只有其余图片参与相似度计算与分配。
+    """
+    if method == "sequential":
+        return list(iter_matches(a_index, b_stream))
+    if method not in ("optimal", "global_greedy"):
+        raise ValueError(f"未知的分配方式: {method}")
+    exact, rest = [], []
+    for item in b_stream:
+        match = direct_match(a_index, item)
+        if match is None:
+            rest.append(item)
+        else:
+            exact.append(match)
+    edges = list(candidate_edges(a_index, rest))
+    matches = assign_optimal(edges) if method == "optimal" else assign_global_greedy(edges)
+    for _b_path, a_path, _similarity in matches:
+        a_index.claim(a_path)
+    return exact + matches
+
+
+def find_best_matches(
+    a_paths: List[str],
+    a_texts: Dict[str, str],
+    b_paths: List[str],
+    b_texts: Dict[str, str],
+    threshold: float,
+    sizes: Optional[Dict[str, Tuple[int, int]]] = None,
+    method: str = MATCH_ASSIGNMENT,
+) -> List[Tuple[str, str, float]]:
+    """
+    一对一匹配：为 B 组图片分配相似度不低于阈值的 A 组图片，分配方式见 MATCH_ASSIGNMENT。
+    
+    sizes 为图片路径 -> (宽, 高)；传入时只在尺寸相同的图片之间匹配（见 sizes_compatible），
+    传 None 即忽略尺寸限制。返回 [(B组路径, A组路径, 相似度), ...]。
+    """
+    sizes = sizes or {}
+    a_index = MatchIndex(threshold, size_limit=bool(sizes))
+    for a_path in a_paths:
+        a_index.add(a_path, a_texts.get(a_path, ""), sizes.get(a_path, (0, 0)))
+    b_stream = ((b_path, b_texts.get(b_path, ""), sizes.get(b_path, (0, 0))) for b_path in b_paths)
+    return assign_matches(a_index, b_stream, method)
+
+
+def rename_target_name(a_path: str, b_path: str) -> str:
+    """B 组图片的目标文件名：A 组图片名 + B 组图片自身的扩展名"""
+    return f"{Path(a_path).stem}{Path(b_path).suffix}"
+
+
+def available_path(new_path: str, current_path: str, taken: Optional[set] = None) -> str:
+    """目标路径已被其他文件（或 taken 中已规划的路径）占用时，依次追加 _1、_2 … 后缀"""
+    candidate = new_path
+    counter = 1
+    while candidate != current_path and (os.path.exists(candidate) or (taken is not None and candidate in taken)):
+        candidate = os.path.join(
+            os.path.dirname(new_path), f"{Path(new_path).stem}_{counter}{Path(new_path).suffix}"
+        )
+        counter += 1
+    return candidate
+
+
+def plan_renames(
+    matches: Iterable[Tuple[str, str, float]],
+    taken: Optional[set] = None,
+) -> List[Tuple[str, str]]:
+    """
+    重命名计划：为每个匹配 (B组路径, A组路径, 相似度) 计算目标路径（A 组名 + B 组扩展名），
+    目标被磁盘上的文件或本计划中更早的目标占用时追加后缀；名称不变的跳过。返回 [(原路径, 目标路径), ...]。
+    """
+    taken = set() if taken is None else taken
+    plan = []
+    for b_path, a_path, _similarity in matches:
+        new_path = available_path(
+            os.path.join(os.path.dirname(b_path), rename_target_name(a_path, b_path)), b_path, taken
+        )
+        taken.add(new_path)
+        if new_path != b_path:
+            plan.append((b_path, new_path))
+    return plan
+
+
+def apply_renames(plan: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str, Optional[OSError]]]:
+    """按计划依次重命名，逐条产出 (原路径, 目标路径, 错误)；单条失败不影响后续条目"""
+    for source, target in plan:
+        try:
+            os.rename(source, target)
+        except OSError as e:
+            yield source, target, e
+            continue
+        yield source, target, None